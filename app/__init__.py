@@ -2,8 +2,9 @@ import os
 import time
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from .replica import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 def create_app():
     app = Flask(__name__, instance_relative_config=True)
@@ -20,6 +21,43 @@ def create_app():
 
     db.init_app(app)
 
+    # Server-side session store (compact id cookie)
+    from . import sessions
+    sessions.init_app(app)
+
+    # Fingerprinted static URLs from `flask build-assets`
+    from . import assets
+    assets.init_app(app)
+
+    # Version-stamped reference data cache (categories, departments)
+    from . import cache
+    cache.init_app(app)
+
+    # Postgres-backed job queue run by `flask worker`
+    from . import jobs
+    jobs.init_app(app)
+
+    from . import commands
+    commands.init_app(app)
+
+    # {% cache %} tag for template fragments (navbar, portal)
+    from . import fragcache
+    fragcache.init_app(app)
+
+    # On-disk Jinja bytecode, filled by `flask compile-templates`
+    from . import jinjacache
+    jinjacache.init_app(app)
+
+    # Request latency, SQL and template timings exposed on /metrics
+    if app.config.get("METRICS_ENABLED", True):
+        from . import metrics
+        metrics.init_app(app)
+
+    # Opt-in N+1 / slow query detector for development and staging
+    if app.config.get("QUERYWATCH_ENABLED"):
+        from . import querywatch
+        querywatch.init_app(app)
+
     # Register LeavePass blueprint
     from .routes import main
     app.register_blueprint(main)
@@ -33,6 +71,7 @@ def create_app():
     app.register_blueprint(helpdesk_bp)
 
     SESSION_TIMEOUT = 10 * 60  # 10 minutes in seconds
+    ACTIVITY_GRANULARITY = app.config.get("SESSION_ACTIVITY_GRANULARITY", 60)
 
     @app.before_request
     def check_session_timeout():
@@ -50,14 +89,33 @@ def create_app():
                     "error",
                 )
                 return _r(_u("main.login"))
-            _s["last_activity"] = time.time()
+            # Only touch the session (and so the store and cookie) when the
+            # timestamp has moved by more than the configured granularity.
+            now = time.time()
+            if last is None or now - last >= ACTIVITY_GRANULARITY:
+                _s["last_activity"] = now
 
     @app.context_processor
     def inject_helpdesk_globals():
-        from flask import session as _session
-        user = _session.get("user")
-        if not user:
-            return {"unread_notifications": 0, "is_helpdesk_staff": False}
+        return nav_globals()
+
+    # ETag / 304 support for dashboards and detail pages
+    from . import conditional
+    conditional.init_app(app)
+
+    # Schema creation and seeding live in `flask init-db`; the factory itself
+    # never touches the database, so workers boot (or fork) without I/O.
+    return app
+
+
+def nav_globals():
+    """Unread count and staff flag for the navbar, computed once per request."""
+    from flask import g, session as _session
+    if "nav_globals" in g:
+        return g.nav_globals
+    user = _session.get("user")
+    result = {"unread_notifications": 0, "is_helpdesk_staff": False, "fleet_alerts": 0}
+    if user:
         try:
             from app.helpdesk.models import Notification, HelpDeskStaff
             username = user.get("username", "")
@@ -67,43 +125,16 @@ def create_app():
             staff = HelpDeskStaff.query.filter_by(
                 username=username, is_active=True
             ).first()
-            return {
+            fleet_alerts = 0
+            if user.get("is_admin"):
+                from app.cars.compliance import alert_count
+                fleet_alerts = alert_count()
+            result = {
                 "unread_notifications": unread,
                 "is_helpdesk_staff": staff is not None,
+                "fleet_alerts": fleet_alerts,
             }
         except Exception:
-            return {"unread_notifications": 0, "is_helpdesk_staff": False}
-
-    with app.app_context():
-        db.create_all()
-        # Seed 5 placeholder cars if fleet is empty
-        from .cars.models import Car
-        if Car.query.count() == 0:
-            _seed_cars()
-
-    return app
-
-
-def _seed_cars():
-    from .cars.models import Car
-    placeholder_cars = [
-        Car(plate_number="12345 AB", make="Toyota", model="Land Cruiser",
-            year=2022, color="White", color_ar="أبيض", seats=7,
-            plate_number_ar="أ ب 12345"),
-        Car(plate_number="67890 CD", make="Nissan", model="Patrol",
-            year=2021, color="Silver", color_ar="فضي", seats=7,
-            plate_number_ar="ج د 67890"),
-        Car(plate_number="11223 EF", make="Toyota", model="Camry",
-            year=2023, color="Black", color_ar="أسود", seats=5,
-            plate_number_ar="هـ و 11223"),
-        Car(plate_number="44556 GH", make="Mitsubishi", model="Pajero",
-            year=2020, color="Grey", color_ar="رمادي", seats=7,
-            plate_number_ar="ج هـ 44556"),
-        Car(plate_number="77889 IJ", make="Ford", model="Explorer",
-            year=2022, color="Blue", color_ar="أزرق", seats=6,
-            plate_number_ar="ي ك 77889"),
-    ]
-    from . import db
-    for car in placeholder_cars:
-        db.session.add(car)
-    db.session.commit()
+            pass
+    g.nav_globals = result
+    return result
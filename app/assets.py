@@ -0,0 +1,99 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+
+try:
+    import brotli
+except ImportError:  # optional; gzip alone is still served by nginx
+    brotli = None
+
+MANIFEST = "manifest.json"
+# User uploads change at runtime and are never fingerprinted here.
+SKIP_DIRS = {"uploads"}
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".txt", ".map"}
+_HASHED = re.compile(r"\.[0-9a-f]{8}\.\w+$")
+
+
+def _digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            h.update(chunk)
+    return h.hexdigest()[:8]
+
+
+def _sources(static_dir):
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        for name in sorted(files):
+            if name == MANIFEST or name.endswith((".gz", ".br")) or _HASHED.search(name):
+                continue
+            yield os.path.relpath(os.path.join(root, name), static_dir).replace(os.sep, "/")
+
+
+def _write_compressed(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    with gzip.open(path + ".gz", "wb", compresslevel=9) as f:
+        f.write(data)
+    if brotli is not None:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def build(static_dir, echo=print):
+    """Copy every static file to a content-hashed name, precompress the
+    text ones and write manifest.json mapping logical to hashed names.
+    Hashed files from the previous build that are no longer referenced are
+    removed. Returns the new manifest."""
+    manifest_path = os.path.join(static_dir, MANIFEST)
+    previous = load_manifest(static_dir)
+    manifest = {}
+    for rel in _sources(static_dir):
+        src = os.path.join(static_dir, rel)
+        stem, ext = os.path.splitext(rel)
+        hashed = f"{stem}.{_digest(src)}{ext}"
+        dest = os.path.join(static_dir, hashed)
+        if not os.path.exists(dest):
+            with open(src, "rb") as f_in, open(dest, "wb") as f_out:
+                f_out.write(f_in.read())
+            if ext.lower() in COMPRESSIBLE:
+                _write_compressed(dest)
+            echo(f"{rel} -> {hashed}")
+        manifest[rel] = hashed
+
+    for rel, hashed in previous.items():
+        if manifest.get(rel) != hashed:
+            for suffix in ("", ".gz", ".br"):
+                stale = os.path.join(static_dir, hashed + suffix)
+                if os.path.exists(stale):
+                    os.remove(stale)
+
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_dir):
+    try:
+        with open(os.path.join(static_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def init_app(app):
+    """Make url_for('static', filename=...) resolve to the hashed name from
+    manifest.json when ASSET_MANIFEST is enabled and a build exists."""
+    if not app.config.get("ASSET_MANIFEST"):
+        return
+    manifest = load_manifest(app.static_folder)
+    if not manifest:
+        return
+
+    @app.url_defaults
+    def _hashed_static(endpoint, values):
+        if endpoint == "static" and "filename" in values:
+            values["filename"] = manifest.get(values["filename"], values["filename"])
@@ -0,0 +1,32 @@
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app import db
+
+# Each batch runs in its own short transaction. Rows a user is touching right
+# now are skipped rather than waited on, and any lock we do need is given up
+# quickly so maintenance never queues up behind (or in front of) live requests.
+LOCK_TIMEOUT = "2s"
+
+
+def run_batches(sql, params, max_batches=None, on_batch=None):
+    """Execute `sql` (which must honour :batch as a row limit) repeatedly
+    until a batch affects fewer than :batch rows. Returns rows affected.
+    `on_batch(affected, total)` runs inside each batch's transaction, e.g. to
+    record progress atomically with the batch."""
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        try:
+            db.session.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+            affected = db.session.execute(text(sql), params).rowcount
+            if on_batch is not None:
+                on_batch(affected, total + affected)
+            db.session.commit()
+        except OperationalError:
+            db.session.rollback()
+            break
+        batches += 1
+        total += affected
+        if affected < params["batch"]:
+            break
+    return total
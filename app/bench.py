@@ -0,0 +1,337 @@
+import json
+import random
+import subprocess
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import event, insert, text
+from sqlalchemy.engine import Engine
+from app import db
+from app.models import LeaveRequest
+from app.cars.models import Car, CarBooking
+from app.helpdesk.models import (
+    HelpDeskCategory, HelpDeskStaff, HelpDeskTicket, TicketMessage, Notification,
+)
+from app.helpdesk.refdata import invalidate_categories
+
+CHUNK = 5000
+BENCH_USER = "bench.user"
+BENCH_STAFF = "bench.staff"
+BENCH_ADMIN = "bench.admin"
+
+DEPARTMENTS = ["IT", "Facilities", "HR", "Finance", "Transport"]
+STATUSES = {
+    "leave": ["draft", "pending", "approved", "archived"],
+    "booking": ["pending", "borrowed", "returned", "archived"],
+    "ticket": ["open", "in_progress", "resolved", "closed"],
+}
+PRIORITIES = ["low", "normal", "high", "urgent"]
+
+
+# ─── Seeding ─────────────────────────────────────────────────────────────────
+
+def _bulk(model, rows):
+    """executemany-insert `rows` (an iterator of dicts) in CHUNK-sized batches."""
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= CHUNK:
+            db.session.execute(insert(model), batch)
+            db.session.commit()
+            total += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(model), batch)
+        db.session.commit()
+        total += len(batch)
+    return total
+
+
+def _username(rng, users):
+    # Skewed so a few users own long histories; index 0 is the heaviest and is
+    # the fixed BENCH_USER the benchmark logs in as.
+    i = min(int(rng.expovariate(1 / (users / 8))), users - 1)
+    return BENCH_USER if i == 0 else f"bench.user{i}"
+
+
+def _moment(rng, years):
+    return datetime.utcnow() - timedelta(minutes=rng.randint(0, years * 365 * 24 * 60))
+
+
+def seed(users=500, leave=50000, cars=200, bookings=30000, tickets=20000,
+         messages=3, notifications=300000, years=3, seed_value=42, echo=print):
+    rng = random.Random(seed_value)
+    stamp = datetime.utcnow().strftime("%y%m%d%H%M%S")
+
+    def leave_rows():
+        for i in range(leave):
+            dep = _moment(rng, years)
+            user = _username(rng, users)
+            yield dict(
+                request_number=f"LB{stamp}{i:06d}", active_language="en",
+                employee_username=user, employee_name=user.replace(".", " ").title(),
+                employee_department=rng.choice(DEPARTMENTS), employee_number=f"{i:06d}",
+                reason="Benchmark leave", destination="Site", manager_name="Bench Manager",
+                employee_name_ar="", employee_department_ar="", reason_ar="",
+                destination_ar="", manager_name_ar="",
+                departure_datetime=dep, return_datetime=dep + timedelta(hours=rng.randint(1, 72)),
+                status=rng.choice(STATUSES["leave"]), created_at=dep - timedelta(days=1),
+                updated_at=dep,
+            )
+    echo(f"leave_requests: {_bulk(LeaveRequest, leave_rows())}")
+
+    def car_rows():
+        for i in range(cars):
+            yield dict(
+                plate_number=f"B{stamp[-6:]}{i:05d}"[:20], plate_number_ar="", make="Bench",
+                model=f"Model {i % 12}", year=2015 + i % 10, color="White", color_ar="",
+                seats=rng.choice([5, 5, 7, 7, 9]), plate_image="", is_active=True,
+                current_mileage=0, created_at=datetime.utcnow(),
+            )
+    echo(f"cars: {_bulk(Car, car_rows())}")
+    car_ids = [c for (c,) in db.session.query(Car.id).all()]
+
+    def booking_rows():
+        for i in range(bookings):
+            dep = _moment(rng, years)
+            status = rng.choice(STATUSES["booking"])
+            returned = status in ("returned", "archived")
+            user = _username(rng, users)
+            yield dict(
+                booking_number=f"CB{stamp}{i:06d}", car_id=rng.choice(car_ids),
+                employee_username=user, employee_name=user.replace(".", " ").title(),
+                employee_name_ar="", employee_department=rng.choice(DEPARTMENTS),
+                employee_department_ar="", employee_number=f"{i:06d}",
+                destination="Site", destination_ar="", purpose="Benchmark", purpose_ar="",
+                manager_name="Bench Manager", manager_name_ar="", planned_departure=dep,
+                actual_departure=dep if status != "pending" else None,
+                actual_return=dep + timedelta(hours=rng.randint(1, 48)) if returned else None,
+                odometer_return=float(rng.randint(1000, 200000)) if returned else None,
+                return_note="", active_language="en", status=status,
+                created_at=dep - timedelta(days=1), updated_at=dep,
+            )
+    echo(f"car_bookings: {_bulk(CarBooking, booking_rows())}")
+
+    # Reused across runs, so seeding again does not pile up duplicate categories.
+    existing = {(c.name, c.department): c for c in HelpDeskCategory.query.filter(
+        HelpDeskCategory.department.in_(DEPARTMENTS))}
+    categories = []
+    for dept in DEPARTMENTS:
+        for j in range(3):
+            name = f"{dept} issue {j}"
+            category = existing.get((name, dept))
+            if category is None:
+                category = HelpDeskCategory(name=name, department=dept)
+                db.session.add(category)
+            categories.append(category)
+    invalidate_categories()
+    if not HelpDeskStaff.query.filter_by(username=BENCH_STAFF).first():
+        db.session.add(HelpDeskStaff(username=BENCH_STAFF, full_name="Bench Staff",
+                                     department=DEPARTMENTS[0]))
+    db.session.commit()
+    cat_ids = [c.id for c in categories]
+
+    def ticket_rows():
+        for i in range(tickets):
+            created = _moment(rng, years)
+            user = _username(rng, users)
+            yield dict(
+                ticket_number=f"HB{stamp}{i:06d}", title=f"Benchmark ticket {i}",
+                title_ar="", description="", description_ar="",
+                category_id=rng.choice(cat_ids), status=rng.choice(STATUSES["ticket"]),
+                priority=rng.choice(PRIORITIES), created_by_username=user,
+                created_by_name=user.replace(".", " ").title(), created_by_name_ar="",
+                assigned_to_username="", active_language="en",
+                created_at=created, updated_at=created + timedelta(hours=rng.randint(0, 96)),
+            )
+    echo(f"helpdesk_tickets: {_bulk(HelpDeskTicket, ticket_rows())}")
+    ticket_ids = [t for (t,) in db.session.query(HelpDeskTicket.id).filter(
+        HelpDeskTicket.ticket_number.like(f"HB{stamp}%")).all()]
+
+    def message_rows():
+        for tid in ticket_ids:
+            for k in range(rng.randint(0, messages * 2)):
+                yield dict(
+                    ticket_id=tid, sender_username=BENCH_STAFF if k % 2 else BENCH_USER,
+                    sender_name="Bench", sender_name_ar="", body="Benchmark reply",
+                    body_ar="", is_staff_reply=bool(k % 2), created_at=_moment(rng, years),
+                )
+    echo(f"ticket_messages: {_bulk(TicketMessage, message_rows())}")
+
+    def notification_rows():
+        for i in range(notifications):
+            tid = rng.choice(ticket_ids) if ticket_ids else 0
+            yield dict(
+                recipient_username=_username(rng, users), title=f"Update on ticket {tid}",
+                title_ar="", body="Benchmark", body_ar="", link=f"/helpdesk/ticket/{tid}",
+                is_read=rng.random() < 0.8, repeat_count=1, created_at=_moment(rng, years),
+            )
+    echo(f"notifications: {_bulk(Notification, notification_rows())}")
+    db.session.execute(text("ANALYZE"))
+    db.session.commit()
+
+
+# ─── Benchmark ───────────────────────────────────────────────────────────────
+
+BENCH_ROUTES = [
+    ("main.dashboard", "/", BENCH_USER),
+    ("cars.dashboard", "/cars", BENCH_USER),
+    ("cars.new_booking", "/cars/new", BENCH_USER),
+    ("helpdesk.dashboard", "/helpdesk", BENCH_USER),
+    ("helpdesk.notifications", "/notifications", BENCH_USER),
+    ("helpdesk.staff_dashboard", "/helpdesk/staff", BENCH_STAFF),
+    ("main.admin_dashboard", "/admin?status=pending", BENCH_ADMIN),
+    ("cars.admin_bookings", "/admin/cars/bookings?status=borrowed", BENCH_ADMIN),
+    ("cars.admin_fleet", "/admin/cars/fleet", BENCH_ADMIN),
+    ("helpdesk.admin_dashboard", "/admin/helpdesk?status=open", BENCH_ADMIN),
+]
+
+
+def _session_user(username):
+    return {
+        "username": username, "full_name": username.replace(".", " ").title(),
+        "department": DEPARTMENTS[0], "employee_number": "000000",
+        "is_admin": username == BENCH_ADMIN, "is_manager": False,
+    }
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _client(app, username):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["user"] = _session_user(username)
+    return client
+
+
+def run(app, iterations=50, warmup=5, echo=print):
+    from app.cache import query_cache
+    counter = {"n": 0}
+    # Measure cached routes as production serves them, not while the
+    # listener is still connecting and cached_all falls through.
+    if query_cache.enabled and not query_cache.wait_until_listening(db.engine):
+        echo("Query cache listener not connected; cached routes will hit the database.")
+
+    def _count(*args):
+        counter["n"] += 1
+
+    event.listen(Engine, "after_cursor_execute", _count)
+    results = {}
+    try:
+        for name, path, username in BENCH_ROUTES:
+            client = _client(app, username)
+            timings, queries, status = [], [], None
+            for i in range(warmup + iterations):
+                counter["n"] = 0
+                start = time.perf_counter()
+                resp = client.get(path)
+                elapsed = (time.perf_counter() - start) * 1000
+                status = resp.status_code
+                if i >= warmup:
+                    timings.append(elapsed)
+                    queries.append(counter["n"])
+            results[name] = {
+                "path": path, "status": status,
+                "p50_ms": round(_percentile(timings, 50), 2),
+                "p95_ms": round(_percentile(timings, 95), 2),
+                "p99_ms": round(_percentile(timings, 99), 2),
+                "queries": round(sum(queries) / len(queries), 1),
+            }
+            r = results[name]
+            echo(f"{name:28} {status}  p50 {r['p50_ms']:8.1f}ms  p95 {r['p95_ms']:8.1f}ms  "
+                 f"p99 {r['p99_ms']:8.1f}ms  {r['queries']:6.1f} queries")
+    finally:
+        event.remove(Engine, "after_cursor_execute", _count)
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "iterations": iterations,
+        "routes": results,
+    }
+
+
+def check_cache(app, timeout=5.0, echo=print):
+    """Run the benchmark routes with the query cache listener connected, then
+    check that a write committed on another connection invalidates cached
+    results. Returns a list of failure messages."""
+    from app.cache import CHANNEL, cached_all, query_cache, touch_tables
+    if not query_cache.enabled:
+        return ["QUERY_CACHE_ENABLED is off"]
+    if not query_cache.wait_until_listening(db.engine, timeout):
+        return ["query cache listener did not connect"]
+    failures = []
+    for name, path, username in BENCH_ROUTES:
+        client = _client(app, username)
+        # The second request is the one served from the cache.
+        statuses = [client.get(path).status_code for _ in range(2)]
+        echo(f"{name:28} {statuses[0]} {statuses[1]}")
+        if max(statuses) >= 500:
+            failures.append(f"{name} returned {statuses}")
+    if not query_cache.stats()["hits"]:
+        failures.append("no route was served from the query cache")
+
+    query = Car.query.order_by(Car.id)
+    cached_all(query)
+    misses = query_cache.stats()["misses"]
+    with db.engine.connect() as conn:
+        conn.execute(text("SELECT pg_notify(:channel, 'cars')"), {"channel": CHANNEL})
+        conn.commit()
+    deadline = time.monotonic() + timeout
+    while query_cache.stats()["misses"] == misses and time.monotonic() < deadline:
+        time.sleep(0.05)
+        cached_all(query)
+    if query_cache.stats()["misses"] == misses:
+        failures.append("a committed write to cars did not invalidate the cached query")
+
+    # A transaction must read its own uncommitted writes, not the cache.
+    cached_all(query)
+    hits = query_cache.stats()["hits"]
+    touch_tables("cars")
+    cached_all(query)
+    db.session.rollback()
+    if query_cache.stats()["hits"] != hits:
+        failures.append("a transaction that wrote to cars was served the cached query")
+    return failures
+
+
+def compare(baseline, current, threshold=20.0, echo=print):
+    """Print per-route deltas against `baseline`. Returns the names of routes
+    whose p95 or query count grew by more than `threshold` percent."""
+    regressions = []
+    for name, now in current["routes"].items():
+        before = baseline.get("routes", {}).get(name)
+        if not before:
+            echo(f"{name:28} (new)")
+            continue
+        deltas = {}
+        for key in ("p50_ms", "p95_ms", "p99_ms", "queries"):
+            deltas[key] = ((now[key] - before[key]) / before[key] * 100) if before[key] else 0.0
+        echo(f"{name:28} p95 {before['p95_ms']:.1f} -> {now['p95_ms']:.1f}ms ({deltas['p95_ms']:+.0f}%)  "
+             f"queries {before['queries']} -> {now['queries']} ({deltas['queries']:+.0f}%)")
+        if deltas["p95_ms"] > threshold or deltas["queries"] > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
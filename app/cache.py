@@ -0,0 +1,323 @@
+import logging
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy import Table, event, inspect, text
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Query
+from sqlalchemy.sql.util import find_tables
+from app import db
+
+log = logging.getLogger(__name__)
+
+
+class CacheVersion(db.Model):
+    """One row per cached namespace. Bumped on every write so that all
+    gunicorn workers notice the change on their next version check."""
+    __tablename__ = "cache_versions"
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+def bump_version(name):
+    """Increment the version row for `name`. Caller is responsible for committing."""
+    db.session.execute(text(
+        "INSERT INTO cache_versions (name, version, updated_at) "
+        "VALUES (:name, 1, now() at time zone 'utc') "
+        "ON CONFLICT (name) DO UPDATE "
+        "SET version = cache_versions.version + 1, updated_at = EXCLUDED.updated_at"
+    ), {"name": name})
+    db.session.info.setdefault("cache_bumped", set()).add(name)
+
+
+def current_version(name):
+    row = db.session.execute(
+        text("SELECT version FROM cache_versions WHERE name = :name"),
+        {"name": name},
+    ).first()
+    return row[0] if row else 0
+
+
+class ReferenceCache:
+    """In-process cache for small, rarely changing reference data.
+
+    Each entry is stored with the DB version it was loaded at. The version
+    row is re-read at most once every `check_interval` seconds per worker,
+    so a write in one worker reaches the others within that window.
+    """
+
+    def __init__(self, check_interval=5):
+        self.check_interval = check_interval
+        self._entries = {}      # name -> (version, value)
+        self._checked = {}      # name -> (monotonic time, version)
+        self._lock = threading.Lock()
+
+    def get(self, name, loader):
+        version = self._version(name)
+        entry = self._entries.get(name)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        value = loader()
+        with self._lock:
+            self._entries[name] = (version, value)
+        return value
+
+    def invalidate(self, name):
+        with self._lock:
+            self._entries.pop(name, None)
+            self._checked.pop(name, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._checked.clear()
+
+    def _version(self, name):
+        now = time.monotonic()
+        checked = self._checked.get(name)
+        if checked is not None and now - checked[0] < self.check_interval:
+            return checked[1]
+        version = current_version(name)
+        with self._lock:
+            self._checked[name] = (now, version)
+        return version
+
+
+reference_cache = ReferenceCache()
+
+
+# ── Query result cache ────────────────────────────────────────────────────────
+#
+# cached_all(query) keeps the result of a read query in a bounded per-worker
+# LRU, keyed by the compiled SQL and its parameters. Each entry remembers the
+# version of every table it read; a write to any of those tables bumps the
+# version and the entry is ignored from then on.
+#
+# Writes are picked up from ORM flushes and ORM bulk insert/update/delete;
+# raw SQL writes must call touch_tables(). The writing worker bumps its own
+# versions after commit. Every other worker hears about it through a
+# pg_notify sent inside the writing transaction (so it is only delivered if
+# the transaction commits) and a LISTEN thread per worker. While that thread
+# is not connected the cache is bypassed, and it is emptied on reconnect
+# because notifications may have been missed.
+
+CHANNEL = "query_cache"
+
+
+class QueryCache:
+    def __init__(self, maxsize=1024, enabled=True):
+        self.maxsize = maxsize
+        self.enabled = enabled
+        self.ignored_tables = set()
+        self.listening = False
+        self.hits = self.misses = 0
+        self._data = OrderedDict()      # key -> (table versions, value)
+        self._versions = {}             # table -> local version counter
+        self._lock = threading.Lock()
+        self._listener_pid = None
+
+    def snapshot(self, tables):
+        with self._lock:
+            return tuple((t, self._versions.get(t, 0)) for t in sorted(tables))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            versions, value = entry
+            if any(self._versions.get(t, 0) != v for t, v in versions):
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, versions, value):
+        with self._lock:
+            self._data[key] = (versions, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def bump(self, tables):
+        with self._lock:
+            for t in tables:
+                self._versions[t] = self._versions.get(t, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize,
+                    "hits": self.hits, "misses": self.misses,
+                    "listening": self.listening}
+
+    def ensure_listener(self, engine):
+        """Start the LISTEN thread once per process (after the gunicorn fork)."""
+        if self._listener_pid == os.getpid():
+            return
+        self._listener_pid = os.getpid()
+        self.listening = False
+        threading.Thread(target=self._listen, args=(engine,),
+                         name="query-cache-listener", daemon=True).start()
+
+    def wait_until_listening(self, engine, timeout=10.0):
+        """Start the listener if needed and block until it is connected.
+        Returns False if it did not connect within `timeout` seconds."""
+        self.ensure_listener(engine)
+        deadline = time.monotonic() + timeout
+        while not self.listening and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self.listening
+
+    def _listen(self, engine):
+        while True:
+            try:
+                raw = engine.raw_connection()
+                conn = raw.driver_connection   # gone from `raw` once detached
+                raw.detach()
+                conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute(f"LISTEN {CHANNEL}")
+                self.clear()
+                self.listening = True
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        cur.execute("SELECT 1")   # notice a dead connection
+                        continue
+                    conn.poll()
+                    tables = set()
+                    while conn.notifies:
+                        tables.update(conn.notifies.pop(0).payload.split(","))
+                    self.bump(tables)
+            except Exception:
+                self.listening = False
+                log.exception("Query cache listener lost its connection; retrying")
+                time.sleep(5)
+
+
+query_cache = QueryCache()
+
+
+def _cache_key(stmt):
+    compiled = stmt.compile(dialect=db.engine.dialect)
+    return str(compiled), repr(sorted(compiled.params.items()))
+
+
+def _detach(value, seen):
+    """Expunge ORM instances (and whatever they have loaded) so cached
+    objects outlive this request's session."""
+    if isinstance(value, (list, tuple, Row)):
+        for item in value:
+            _detach(item, seen)
+        return
+    state = inspect(value, raiseerr=False)
+    if state is None or not hasattr(state, "mapper") or id(value) in seen:
+        return
+    seen.add(id(value))
+    if state.session is not None:
+        state.session.expunge(value)
+    for rel in state.mapper.relationships:
+        if rel.key in state.dict and state.dict[rel.key] is not None:
+            _detach(state.dict[rel.key], seen)
+
+
+def cached_all(query, tables=()):
+    """Return query.all() (or session.execute(select).all()), served from the
+    query cache when possible. Tables are read from the statement; list any
+    extra ones pulled in by eager loads in `tables`. ORM objects come back
+    detached: only use columns and relationships that were loaded."""
+    from app.replica import routed_to_replica
+    stmt = query.statement if isinstance(query, Query) else query
+    run = query.all if isinstance(query, Query) else (lambda: db.session.execute(stmt).all())
+    if not query_cache.enabled or routed_to_replica():
+        return run()
+    query_cache.ensure_listener(db.engine)
+    if not query_cache.listening:
+        return run()
+
+    names = {t.name for t in find_tables(stmt, include_joins=True) if isinstance(t, Table)}
+    names |= set(tables)
+    # This transaction's own uncommitted writes are invisible to other
+    # requests: never serve a cached result past them, nor cache one.
+    sess = db.session()
+    if sess.new or sess.dirty or sess.deleted or names & sess.info.get("written_tables", set()):
+        return run()
+
+    key = _cache_key(stmt)
+    value = query_cache.get(key)
+    if value is not None:
+        return value
+    # Snapshot before running, so a write that lands meanwhile invalidates it.
+    versions = query_cache.snapshot(names)
+    value = run()
+    _detach(value, set())
+    query_cache.put(key, versions, value)
+    return value
+
+
+def touch_tables(*tables, session=None):
+    """Record raw-SQL writes to `tables` in the current transaction."""
+    _record_writes(session or db.session(), tables)
+
+
+def _record_writes(sess, tables):
+    if not query_cache.enabled:
+        return
+    tables = set(tables) - query_cache.ignored_tables
+    written = sess.info.setdefault("written_tables", set())
+    new = tables - written
+    if not new:
+        return
+    written.update(new)
+    # Sent inside the transaction: Postgres only delivers it on commit.
+    sess.connection(bind_arguments={"bind": db.engine}).execute(
+        text("SELECT pg_notify(:channel, :tables)"),
+        {"channel": CHANNEL, "tables": ",".join(sorted(new))},
+    )
+
+
+@event.listens_for(db.session, "after_flush")
+def _tables_from_flush(sess, flush_context):
+    tables = {inspect(obj).mapper.local_table.name
+              for obj in (*sess.new, *sess.dirty, *sess.deleted)}
+    if tables:
+        _record_writes(sess, tables)
+
+
+@event.listens_for(db.session, "do_orm_execute")
+def _tables_from_bulk(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _record_writes(orm_execute_state.session, {orm_execute_state.statement.table.name})
+
+
+@event.listens_for(db.session, "after_commit")
+def _invalidate_bumped(sess):
+    # Drop local entries only once the new version is visible to others,
+    # so this worker never re-caches the old rows under the old version.
+    for name in sess.info.pop("cache_bumped", ()):
+        reference_cache.invalidate(name)
+    query_cache.bump(sess.info.pop("written_tables", ()))
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_bumped(sess):
+    sess.info.pop("cache_bumped", None)
+    sess.info.pop("written_tables", None)
+
+
+def init_app(app):
+    reference_cache.check_interval = app.config.get("REFDATA_CHECK_SECONDS", 5)
+    query_cache.enabled = app.config.get("QUERY_CACHE_ENABLED", True)
+    query_cache.maxsize = app.config.get("QUERY_CACHE_SIZE", 1024)
+    # Session rows change on almost every request and are never cached.
+    query_cache.ignored_tables = {app.config.get("SESSION_SQLALCHEMY_TABLE", "sessions")}
@@ -0,0 +1,135 @@
+from datetime import datetime
+from sqlalchemy import update
+from app import db
+from app.cars.compliance import refresh_alerts
+from app.cars.models import Car, CarBooking
+from app.cars.odometer import record_reading
+from app.cars.rollups import UPSERT_SQL, usage_rows
+
+# Bulk status changes for the bookings page (morning key hand-over, evening
+# returns). All rows are locked and checked up front; rows that fail a check
+# are reported and skipped, the rest are written in the caller's transaction.
+# Hand-overs and archiving are one UPDATE each, whatever the batch size.
+# Returns go row by row through the odometer log (each depends on the
+# previous reading for that car), but their rollup rows go in one UPSERT.
+
+MAX_TRANSITIONS = 200
+
+# target status -> statuses it may be reached from
+ALLOWED_FROM = {
+    "borrowed": {"pending"},
+    "returned": {"borrowed"},
+    "archived": {"pending", "returned"},
+}
+
+
+def _parse_time(value, default):
+    if not value:
+        return default
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M")
+
+
+def apply_transitions(items, recorded_by):
+    """Validate and apply [{"id", "status", ...}, ...]. Returns one result
+    dict per item, in order. Caller is responsible for committing."""
+    now = datetime.utcnow()
+    results = [{"id": item.get("id"), "ok": False} for item in items]
+
+    ids = []
+    for result, item in zip(results, items):
+        try:
+            result["id"] = int(item.get("id"))
+        except (TypeError, ValueError):
+            result["error"] = "id must be an integer"
+            continue
+        if item.get("status") not in ALLOWED_FROM:
+            result["error"] = f"unsupported status {item.get('status')!r}"
+            continue
+        ids.append(result["id"])
+
+    bookings = {b.id: b for b in CarBooking.query.filter(CarBooking.id.in_(ids))
+                .order_by(CarBooking.id).with_for_update()} if ids else {}
+    car_ids = sorted({b.car_id for b in bookings.values()})
+    cars = {c.id: c for c in Car.query.filter(Car.id.in_(car_ids))
+            .order_by(Car.id).with_for_update()} if car_ids else {}
+    cars_out = {car_id for (car_id,) in db.session.query(CarBooking.car_id).filter(
+        CarBooking.car_id.in_(car_ids), CarBooking.status == "borrowed")} if car_ids else set()
+
+    seen = set()
+    handovers, archives, returns = [], [], []
+    for result, item in zip(results, items):
+        if "error" in result:
+            continue
+        booking = bookings.get(result["id"])
+        if booking is None:
+            result["error"] = "booking not found"
+            continue
+        if booking.id in seen:
+            result["error"] = "booking listed more than once"
+            continue
+        seen.add(booking.id)
+        result["booking_number"] = booking.booking_number
+        status = item["status"]
+        if booking.status not in ALLOWED_FROM[status]:
+            result["error"] = f"cannot change {booking.status} to {status}"
+            continue
+        try:
+            if status == "borrowed":
+                if booking.car_id in cars_out:
+                    result["error"] = "car is already out"
+                    continue
+                departure = _parse_time(item.get("actual_departure"), now)
+                if departure > now:
+                    result["error"] = "hand-over time is in the future"
+                    continue
+                # Times are entered to the minute; compare at that precision.
+                if booking.created_at and departure < booking.created_at.replace(second=0, microsecond=0):
+                    result["error"] = "hand-over time is before the booking was made"
+                    continue
+                cars_out.add(booking.car_id)
+                handovers.append({"id": booking.id, "actual_departure": departure})
+            elif status == "archived":
+                archives.append(booking.id)
+            else:
+                returned_at = _parse_time(item.get("actual_return"), now)
+                if booking.actual_departure and returned_at < booking.actual_departure:
+                    result["error"] = "return time is before the hand-over time"
+                    continue
+                odometer = float(item.get("odometer_return"))
+                returns.append((returned_at, booking, odometer, (item.get("return_note") or "").strip(), result))
+        except (TypeError, ValueError):
+            result["error"] = "invalid odometer or date value"
+            continue
+        result["ok"] = True
+        result["status"] = status
+
+    if handovers:
+        db.session.execute(update(CarBooking), [
+            dict(row, status="borrowed", updated_at=now) for row in handovers])
+    if archives:
+        CarBooking.query.filter(CarBooking.id.in_(archives)).update(
+            {"status": "archived", "updated_at": now}, synchronize_session=False)
+
+    usage = []
+    returned_cars = set()
+    # Oldest first, so each car's readings are checked against the one before.
+    for returned_at, booking, odometer, note, result in sorted(returns, key=lambda r: r[0]):
+        car = cars[booking.car_id]
+        if car.current_mileage and odometer < car.current_mileage:
+            result.update(ok=False, error=(
+                f"odometer {odometer:,.0f} km is below the last reading {car.current_mileage:,.0f} km"))
+            result.pop("status")
+            continue
+        booking.odometer_return = odometer
+        booking.actual_return = returned_at
+        booking.return_note = note
+        booking.status = "returned"
+        km = record_reading(car, odometer, "return", booking=booking, recorded_by=recorded_by)
+        usage.extend(usage_rows(booking.car_id, booking.actual_departure, returned_at, km))
+        returned_cars.add(car.id)
+    if usage:
+        db.session.execute(UPSERT_SQL, usage)
+    db.session.flush()
+    for car_id in sorted(returned_cars):
+        refresh_alerts(car_id)
+    return results
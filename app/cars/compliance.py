@@ -0,0 +1,108 @@
+from datetime import date, timedelta
+from flask import current_app
+from sqlalchemy import text
+from app import db
+from app.cache import bump_version, reference_cache
+
+# car_alerts holds one row per active car per open compliance issue:
+# registration expired or expiring, and major/minor service due by date or
+# by kilometres driven since the service. The `cars.refresh_alerts` job
+# rebuilds it nightly, and fleet edits and returns refresh the one car they
+# touch, so the fleet page and the admin navbar read a small indexed table
+# instead of working out every car's status on each render.
+#
+# Kilometres since a service are the current mileage minus the last reading
+# in odometer_readings on or before the service date; without such a reading
+# only the date interval applies.
+
+ALERTS = "car_alerts"
+
+REGISTRATION_EXPIRED = "registration_expired"
+REGISTRATION_EXPIRING = "registration_expiring"
+MAJOR_SERVICE_DUE = "major_service_due"
+MINOR_SERVICE_DUE = "minor_service_due"
+KINDS = (REGISTRATION_EXPIRED, REGISTRATION_EXPIRING, MAJOR_SERVICE_DUE, MINOR_SERVICE_DUE)
+
+CARS_SQL = text(
+    "SELECT c.id, c.current_mileage, c.registration_expiry, "
+    "  c.last_major_maintenance, c.last_minor_maintenance, "
+    "  (SELECT reading FROM odometer_readings o WHERE o.car_id = c.id "
+    "   AND o.recorded_at < c.last_major_maintenance + 1 "
+    "   ORDER BY o.recorded_at DESC LIMIT 1) AS major_reading, "
+    "  (SELECT reading FROM odometer_readings o WHERE o.car_id = c.id "
+    "   AND o.recorded_at < c.last_minor_maintenance + 1 "
+    "   ORDER BY o.recorded_at DESC LIMIT 1) AS minor_reading "
+    "FROM cars c WHERE c.is_active AND (CAST(:car_id AS INTEGER) IS NULL OR c.id = :car_id)"
+)
+
+
+def _service_alert(kind, car_id, serviced_on, serviced_reading, mileage, days, km, today):
+    if not serviced_on:
+        return None
+    due_on = serviced_on + timedelta(days=days)
+    km_over = None
+    if serviced_reading is not None and km:
+        km_over = (mileage or 0) - serviced_reading - km
+    if due_on > today and (km_over is None or km_over < 0):
+        return None
+    return {"car_id": car_id, "kind": kind, "severity": "warning", "due_on": due_on,
+            "km_over": km_over if km_over is not None and km_over >= 0 else None}
+
+
+def evaluate(car, today, cfg):
+    """Alert rows for one row of CARS_SQL."""
+    alerts = []
+    if car.registration_expiry:
+        days_left = (car.registration_expiry - today).days
+        if days_left < 0:
+            alerts.append({"car_id": car.id, "kind": REGISTRATION_EXPIRED, "severity": "danger",
+                           "due_on": car.registration_expiry, "km_over": None})
+        elif days_left <= cfg.get("REGISTRATION_WARNING_DAYS", 30):
+            alerts.append({"car_id": car.id, "kind": REGISTRATION_EXPIRING, "severity": "warning",
+                           "due_on": car.registration_expiry, "km_over": None})
+    for kind, serviced_on, reading, prefix in (
+        (MAJOR_SERVICE_DUE, car.last_major_maintenance, car.major_reading, "MAJOR"),
+        (MINOR_SERVICE_DUE, car.last_minor_maintenance, car.minor_reading, "MINOR"),
+    ):
+        alert = _service_alert(kind, car.id, serviced_on, reading, car.current_mileage,
+                               cfg.get(f"{prefix}_SERVICE_DAYS", 365),
+                               cfg.get(f"{prefix}_SERVICE_KM"), today)
+        if alert:
+            alerts.append(alert)
+    return alerts
+
+
+def refresh_alerts(car_id=None):
+    """Rebuild car_alerts for every active car, or just `car_id`. Returns the
+    number of alerts written. Caller is responsible for committing."""
+    cfg = current_app.config
+    today = date.today()
+    rows = []
+    for car in db.session.execute(CARS_SQL, {"car_id": car_id}):
+        rows.extend(evaluate(car, today, cfg))
+    if car_id is None:
+        db.session.execute(text("DELETE FROM car_alerts"))
+    else:
+        db.session.execute(text("DELETE FROM car_alerts WHERE car_id = :car_id"), {"car_id": car_id})
+    if rows:
+        db.session.execute(text(
+            "INSERT INTO car_alerts (car_id, kind, severity, due_on, km_over, computed_at) "
+            "VALUES (:car_id, :kind, :severity, :due_on, :km_over, now() at time zone 'utc')"
+        ), rows)
+    bump_version(ALERTS)
+    return len(rows)
+
+
+def alerts_by_car():
+    """{car_id: [CarAlert, ...]} for the fleet page."""
+    from app.cars.models import CarAlert
+    grouped = {}
+    for alert in CarAlert.query.order_by(CarAlert.car_id, CarAlert.kind):
+        grouped.setdefault(alert.car_id, []).append(alert)
+    return grouped
+
+
+def alert_count():
+    """Cars with at least one open alert, cached per worker until the next refresh."""
+    return reference_cache.get(ALERTS, lambda: db.session.execute(
+        text("SELECT count(DISTINCT car_id) FROM car_alerts")).scalar() or 0)
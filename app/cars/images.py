@@ -0,0 +1,122 @@
+import hashlib
+import os
+import tempfile
+import time
+from flask import current_app
+from app import db
+
+try:
+    from PIL import Image
+except ImportError:  # optional; lists fall back to the full-size image
+    Image = None
+
+# Plate photos are stored under the SHA-256 of their content, so a file name
+# never changes meaning: two cars with the same photo share one file,
+# re-uploading a car's photo cannot overwrite another car's, and nginx can
+# cache them forever. save_upload() streams the upload to a temp file while
+# hashing it, then renames it into place. The `cars.make_thumbnail` job
+# writes a fixed-size JPEG thumbnail next to it and points every car using
+# that photo at it. Files no car refers to any more are removed by the
+# `cars.sweep_images` job after a grace period.
+
+UPLOAD_DIR = os.path.join("static", "uploads", "cars")
+ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "webp"}
+CHUNK_SIZE = 64 * 1024
+TEMP_PREFIX = ".upload-"
+
+
+def upload_dir():
+    return os.path.join(current_app.root_path, UPLOAD_DIR)
+
+
+def allowed_file(filename):
+    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def thumb_name(name):
+    return name.rsplit(".", 1)[0] + ".thumb.jpg"
+
+
+def save_upload(file):
+    """Store an uploaded FileStorage under its content hash and return the
+    file name. An identical file already on disk is reused."""
+    ext = file.filename.rsplit(".", 1)[1].lower()
+    if ext == "jpeg":
+        ext = "jpg"
+    directory = upload_dir()
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, tmp = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in iter(lambda: file.stream.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                out.write(chunk)
+        name = f"{digest.hexdigest()[:32]}.{ext}"
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            os.unlink(tmp)
+            os.utime(path)  # keep the sweeper off it until this request commits
+        else:
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return name
+
+
+def make_thumbnail(name):
+    """Write the thumbnail for `name` and set it on every car using that
+    photo. Returns False when Pillow is not installed or the file is gone."""
+    from app.cache import bump_version
+    from app.cars.models import Car
+    if Image is None:
+        return False
+    directory = upload_dir()
+    source = os.path.join(directory, name)
+    if not os.path.exists(source):
+        return False
+    thumb = thumb_name(name)
+    target = os.path.join(directory, thumb)
+    if not os.path.exists(target):
+        size = current_app.config.get("CAR_THUMB_SIZE", (320, 200))
+        with Image.open(source) as img:
+            img = img.convert("RGB")
+            img.thumbnail(size)
+            fd, tmp = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=directory)
+            with os.fdopen(fd, "wb") as out:
+                img.save(out, "JPEG", quality=82, optimize=True)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, target)
+    updated = Car.query.filter(Car.plate_image == name, Car.plate_thumb != thumb).update(
+        {"plate_thumb": thumb}, synchronize_session=False)
+    if updated:
+        bump_version("fleet")
+    return True
+
+
+def sweep_orphans(grace_seconds=3600, echo=print):
+    """Delete upload files no car refers to, once they are older than
+    `grace_seconds` (so a photo saved by a request that has not committed
+    yet is left alone). Returns the number of files removed."""
+    from app.cars.models import Car
+    directory = upload_dir()
+    if not os.path.isdir(directory):
+        return 0
+    keep = set()
+    for image, thumb in db.session.query(Car.plate_image, Car.plate_thumb):
+        keep.update(n for n in (image, thumb) if n)
+    cutoff = time.time() - grace_seconds
+    removed = 0
+    for entry in os.scandir(directory):
+        if not entry.is_file() or entry.name in keep:
+            continue
+        if entry.name.startswith(".") and not entry.name.startswith(TEMP_PREFIX):
+            continue
+        if entry.stat().st_mtime < cutoff:
+            os.unlink(entry.path)
+            removed += 1
+    echo(f"Removed {removed} unused car images.")
+    return removed
@@ -1,5 +1,7 @@
 from app import db
 from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
 
 
 class Car(db.Model):
@@ -14,6 +16,7 @@ class Car(db.Model):
     color_ar = db.Column(db.String(30), default="")
     seats = db.Column(db.Integer, default=5)
     plate_image = db.Column(db.String(200), default="")
+    plate_thumb = db.Column(db.String(200), default="", nullable=False)   # set by cars.make_thumbnail
     is_active = db.Column(db.Boolean, default=True)
     current_mileage = db.Column(db.Float, default=0)
     last_major_maintenance = db.Column(db.Date, nullable=True)
@@ -31,17 +34,19 @@ class Car(db.Model):
             return f"/static/uploads/cars/{self.plate_image}"
         return ""
 
+    def thumb_url(self):
+        """Small version for lists; the full image until the thumbnail exists."""
+        if self.plate_thumb:
+            return f"/static/uploads/cars/{self.plate_thumb}"
+        return self.image_url()
+
     def last_return_note(self):
         """Return the note from the most recent completed booking."""
-        last = CarBooking.query.filter_by(
-            car_id=self.id, status="returned"
-        ).order_by(CarBooking.actual_return.desc()).first()
+        last = self.last_return
         return last.return_note if last and last.return_note else ""
 
     def last_borrower_name(self):
-        last = CarBooking.query.filter_by(
-            car_id=self.id, status="returned"
-        ).order_by(CarBooking.actual_return.desc()).first()
+        last = self.last_return
         return last.employee_name if last else ""
 
     def registration_status(self):
@@ -66,6 +71,12 @@ class Car(db.Model):
 
 class CarBooking(db.Model):
     __tablename__ = "car_bookings"
+    __table_args__ = (
+        db.Index("ix_car_bookings_status_car_id_actual_return",
+                 "status", "car_id", "actual_return"),
+        db.Index("ix_car_bookings_employee_username_created_at",
+                 "employee_username", "created_at"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     booking_number = db.Column(db.String(20), unique=True, nullable=False)
     car_id = db.Column(db.Integer, db.ForeignKey("cars.id"), nullable=False)
@@ -108,7 +119,72 @@ class CarBooking(db.Model):
         }.get(self.status, "badge-pending")
 
 
+# Car.last_return: the car's most recent returned booking. One DISTINCT ON
+# query serves any number of cars, so list pages should eager-load it with
+# options(selectinload(Car.last_return)); the filter on car_id is pushed into
+# the subquery and walks ix_car_bookings_status_car_id_actual_return.
+_latest_return = (
+    select(CarBooking)
+    .where(CarBooking.status == "returned")
+    .distinct(CarBooking.car_id)
+    .order_by(CarBooking.car_id, CarBooking.actual_return.desc(), CarBooking.id.desc())
+    .subquery()
+)
+LastReturn = aliased(CarBooking, _latest_return)
+
+Car.last_return = db.relationship(
+    LastReturn, primaryjoin=Car.id == LastReturn.car_id,
+    uselist=False, viewonly=True,
+)
+
+
 def generate_booking_number():
     year = datetime.now().year
     count = CarBooking.query.count() + 1
-    return f"CB-{year}-{count:05d}"
\ No newline at end of file
+    return f"CB-{year}-{count:05d}"
+
+class CarDailyUsage(db.Model):
+    """Per-car, per-day totals of completed bookings (see app/cars/rollups.py)."""
+    __tablename__ = "car_daily_usage"
+    __table_args__ = (
+        db.Index("ix_car_daily_usage_day", "day"),
+    )
+    car_id = db.Column(db.Integer, db.ForeignKey("cars.id"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    trips = db.Column(db.Integer, default=0, nullable=False)          # returns recorded that day
+    seconds_out = db.Column(db.Integer, default=0, nullable=False)    # time out, split at midnight
+    km = db.Column(db.Float, default=0, nullable=False)               # odometer delta, spread like seconds_out
+
+
+class OdometerReading(db.Model):
+    """Append-only odometer log. `delta` is the distance since the car's
+    previous reading, computed when the row is written."""
+    __tablename__ = "odometer_readings"
+    __table_args__ = (
+        db.Index("ix_odometer_readings_car_id_recorded_at", "car_id", "recorded_at"),
+        db.Index("ix_odometer_readings_employee_username_recorded_at",
+                 "employee_username", "recorded_at"),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    car_id = db.Column(db.Integer, db.ForeignKey("cars.id"), nullable=False)
+    booking_id = db.Column(db.Integer, db.ForeignKey("car_bookings.id"), nullable=True, index=True)
+    employee_username = db.Column(db.String(50), nullable=True)   # driver, for returns
+    source = db.Column(db.String(20), nullable=False)              # initial / return / fleet_edit
+    reading = db.Column(db.Float, nullable=False)
+    delta = db.Column(db.Float, nullable=True)                     # None for the first reading
+    recorded_by = db.Column(db.String(50), default="")
+    recorded_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class CarAlert(db.Model):
+    """Open compliance issue for an active car, rebuilt by app/cars/compliance.py."""
+    __tablename__ = "car_alerts"
+    __table_args__ = (
+        db.Index("ix_car_alerts_kind", "kind"),
+    )
+    car_id = db.Column(db.Integer, db.ForeignKey("cars.id"), primary_key=True)
+    kind = db.Column(db.String(30), primary_key=True)      # see compliance.KINDS
+    severity = db.Column(db.String(10), nullable=False)    # danger / warning
+    due_on = db.Column(db.Date, nullable=True)             # expiry or service date
+    km_over = db.Column(db.Float, nullable=True)           # km past the service interval
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
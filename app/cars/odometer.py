@@ -0,0 +1,60 @@
+from sqlalchemy import text
+from app import db
+from app.cars.models import OdometerReading
+
+# Every change to Car.current_mileage goes through record_reading(), which
+# appends to odometer_readings with the distance since the previous reading
+# already worked out. Mileage per car or per employee is then a sum over an
+# index range instead of a window over car_bookings.
+
+
+def record_reading(car, reading, source, booking=None, recorded_by=""):
+    """Log `reading` for `car` and make it the car's current mileage.
+    Returns the distance since the previous reading (None if there was
+    none). Caller is responsible for committing."""
+    previous = car.current_mileage
+    if source == "fleet_edit" and previous == reading:
+        return 0.0
+    delta = reading - previous if previous else None
+    entry = OdometerReading(car_id=car.id, source=source, reading=reading,
+                            delta=delta, recorded_by=recorded_by)
+    if booking is not None:
+        entry.booking_id = booking.id
+        entry.employee_username = booking.employee_username
+        entry.recorded_at = booking.actual_return
+    db.session.add(entry)
+    car.current_mileage = reading
+    return delta
+
+
+def mileage_by_employee(start, end, limit=20):
+    """Top drivers by km on returns recorded in [start, end)."""
+    return db.session.execute(text(
+        "SELECT o.employee_username, max(b.employee_name) AS employee_name, "
+        "sum(o.delta) AS km, count(*) AS trips "
+        "FROM odometer_readings o JOIN car_bookings b ON b.id = o.booking_id "
+        "WHERE o.source = 'return' AND o.recorded_at >= :start AND o.recorded_at < :end "
+        "GROUP BY o.employee_username ORDER BY km DESC NULLS LAST LIMIT :limit"
+    ), {"start": start, "end": end, "limit": limit}).fetchall()
+
+
+def backfill(echo=print):
+    """Add log rows for returned bookings recorded before the log existed."""
+    inserted = db.session.execute(text(
+        "INSERT INTO odometer_readings "
+        "(car_id, booking_id, employee_username, source, reading, delta, recorded_by, recorded_at) "
+        "SELECT car_id, id, employee_username, 'return', odometer_return, delta, "
+        "  'backfill', actual_return "
+        "FROM ("
+        "  SELECT id, car_id, employee_username, odometer_return, actual_return, "
+        "    odometer_return - LAG(odometer_return) "
+        "      OVER (PARTITION BY car_id ORDER BY actual_return, id) AS delta "
+        "  FROM car_bookings "
+        "  WHERE status IN ('returned', 'archived') AND odometer_return IS NOT NULL "
+        "  AND actual_return IS NOT NULL"
+        ") b "
+        "WHERE NOT EXISTS (SELECT 1 FROM odometer_readings o WHERE o.booking_id = b.id)"
+    )).rowcount
+    db.session.commit()
+    echo(f"Logged {inserted} past returns.")
+    return inserted
@@ -0,0 +1,96 @@
+from datetime import datetime, time, timedelta
+from sqlalchemy import text
+from app import db
+
+# car_daily_usage holds one row per car per day. A return adds its time out
+# to every day it spans (split at midnight), spreads the kilometres driven
+# (the trip delta from the odometer log) over those days in the
+# same proportion, and counts one trip on the return day. The analytics page
+# reads only this table. `flask rebuild-car-usage` recomputes it from the
+# returned bookings, e.g. after a returned booking has been reset by hand.
+
+UPSERT_SQL = text(
+    "INSERT INTO car_daily_usage (car_id, day, trips, seconds_out, km) "
+    "VALUES (:car_id, :day, :trips, :seconds, :km) "
+    "ON CONFLICT (car_id, day) DO UPDATE SET "
+    "trips = car_daily_usage.trips + EXCLUDED.trips, "
+    "seconds_out = car_daily_usage.seconds_out + EXCLUDED.seconds_out, "
+    "km = car_daily_usage.km + EXCLUDED.km"
+)
+
+
+def split_by_day(start, end):
+    """Yield (date, seconds) for each calendar day the interval touches."""
+    cursor = start
+    while cursor < end:
+        next_midnight = datetime.combine(cursor.date() + timedelta(days=1), time.min)
+        stop = min(end, next_midnight)
+        yield cursor.date(), int((stop - cursor).total_seconds())
+        cursor = stop
+
+
+def usage_rows(car_id, departure, returned, km):
+    """Rows to add to car_daily_usage for one completed booking."""
+    km = max(km or 0.0, 0.0)
+    if not departure or departure >= returned:
+        return [{"car_id": car_id, "day": returned.date(), "trips": 1, "seconds": 0, "km": km}]
+    spans = list(split_by_day(departure, returned))
+    total = sum(seconds for _, seconds in spans) or 1
+    return [
+        {"car_id": car_id, "day": day, "seconds": seconds,
+         "km": km * seconds / total, "trips": 1 if day == returned.date() else 0}
+        for day, seconds in spans
+    ]
+
+
+def record_return(booking, km):
+    """Add a just-returned booking, which drove `km`, to the rollup. Caller
+    is responsible for committing."""
+    db.session.execute(UPSERT_SQL, usage_rows(
+        booking.car_id, booking.actual_departure, booking.actual_return, km))
+
+
+def rebuild(echo=print):
+    """Recompute car_daily_usage from every returned booking."""
+    bookings = db.session.execute(text(
+        "SELECT b.car_id, b.actual_departure, b.actual_return, COALESCE(o.delta, "
+        "  b.odometer_return - LAG(b.odometer_return) "
+        "    OVER (PARTITION BY b.car_id ORDER BY b.actual_return, b.id)) AS km "
+        "FROM car_bookings b LEFT JOIN odometer_readings o "
+        "ON o.booking_id = b.id AND o.source = 'return' "
+        "WHERE b.status IN ('returned', 'archived') AND b.actual_return IS NOT NULL"
+    ))
+    db.session.execute(text("DELETE FROM car_daily_usage"))
+    count = 0
+    batch = []
+    for b in bookings:
+        batch.extend(usage_rows(b.car_id, b.actual_departure, b.actual_return, b.km))
+        count += 1
+        if len(batch) >= 5000:
+            db.session.execute(UPSERT_SQL, batch)
+            batch = []
+    if batch:
+        db.session.execute(UPSERT_SQL, batch)
+    db.session.commit()
+    echo(f"Rolled up {count} returned bookings.")
+    return count
+
+
+def fleet_usage(start, end):
+    """Per-car totals and per-day fleet totals between two dates (inclusive).
+    Cars that are inactive now are still listed, with is_active set, so their
+    usage inside the window is not lost."""
+    params = {"start": start, "end": end}
+    per_car = db.session.execute(text(
+        "SELECT c.id, c.plate_number, c.make, c.model, c.year, c.is_active, "
+        "COALESCE(sum(u.trips), 0) AS trips, COALESCE(sum(u.seconds_out), 0) AS seconds_out, "
+        "COALESCE(sum(u.km), 0) AS km, count(u.day) AS days_used "
+        "FROM cars c LEFT JOIN car_daily_usage u "
+        "ON u.car_id = c.id AND u.day BETWEEN :start AND :end "
+        "GROUP BY c.id ORDER BY seconds_out DESC, c.plate_number"
+    ), params).fetchall()
+    per_day = db.session.execute(text(
+        "SELECT day, sum(seconds_out) AS seconds_out, sum(km) AS km, sum(trips) AS trips "
+        "FROM car_daily_usage WHERE day BETWEEN :start AND :end GROUP BY day ORDER BY day"
+    ), params).fetchall()
+    return per_car, per_day
@@ -1,20 +1,24 @@
-import os
 from datetime import datetime, timedelta
 from functools import wraps
-from werkzeug.utils import secure_filename
 from flask import (
     render_template, redirect, url_for, request,
     session, flash, current_app
 )
 from app import db
 from app.auth import get_managers
+from app.cache import bump_version, cached_all, current_version
+from app.conditional import conditional_get
+from app.replica import use_replica
 from app.cars import cars_bp
 from app.cars.models import Car, CarBooking, generate_booking_number
+from app.jobs import enqueue
+from app.cars.compliance import refresh_alerts
+from app.cars.images import allowed_file, save_upload
+from app.cars.odometer import record_reading
+from app.cars.rollups import record_return
 
-ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "webp"}
-
-def allowed_file(filename):
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+# cache_versions row bumped on every fleet edit (cars have no updated_at)
+FLEET = "fleet"
 
 def login_required(f):
     @wraps(f)
@@ -43,9 +47,11 @@ def _parse_date(val):
     except ValueError:
         return None
 
-def _get_car_states():
+def _get_car_states(cars):
+    """Booking state per car id. `cars` should have Car.last_return loaded."""
     states = {}
     active = CarBooking.query.filter(
+        CarBooking.car_id.in_([car.id for car in cars]),
         CarBooking.status.in_(["pending", "borrowed"])
     ).order_by(CarBooking.created_at.desc()).all()
     for b in active:
@@ -57,26 +63,23 @@ def _get_car_states():
                 "last_borrowed_date": "",
                 "last_return_note": ""
             }
-    returned = CarBooking.query.filter(
-        CarBooking.status == "returned"
-    ).order_by(CarBooking.actual_return.desc()).all()
-    seen = set()
-    for b in returned:
-        if b.car_id not in seen:
-            seen.add(b.car_id)
-            last_date = b.actual_return.strftime("%d %b %Y, %I:%M %p") if b.actual_return else ""
-            if b.car_id not in states:
-                states[b.car_id] = {
-                    "status": "free",
-                    "borrower": "",
-                    "last_borrower": b.employee_name,
-                    "last_borrowed_date": last_date,
-                    "last_return_note": b.return_note or ""
-                }
-            else:
-                states[b.car_id]["last_borrower"] = b.employee_name
-                states[b.car_id]["last_borrowed_date"] = last_date
-                states[b.car_id]["last_return_note"] = b.return_note or ""
+    for car in cars:
+        b = car.last_return
+        if b is None:
+            continue
+        last_date = b.actual_return.strftime("%d %b %Y, %I:%M %p") if b.actual_return else ""
+        if car.id not in states:
+            states[car.id] = {
+                "status": "free",
+                "borrower": "",
+                "last_borrower": b.employee_name,
+                "last_borrowed_date": last_date,
+                "last_return_note": b.return_note or ""
+            }
+        else:
+            states[car.id]["last_borrower"] = b.employee_name
+            states[car.id]["last_borrowed_date"] = last_date
+            states[car.id]["last_return_note"] = b.return_note or ""
     return states
 
 
@@ -86,24 +89,33 @@ def portal():
     return render_template("cars/portal.html")
 
 
+def _dashboard_signal():
+    from sqlalchemy import func
+    counts = db.session.query(
+        func.count(CarBooking.id), func.max(CarBooking.updated_at)
+    ).filter_by(employee_username=session["user"]["username"]).one()
+    return tuple(counts) + (current_version(FLEET),)
+
+
 @cars_bp.route("/cars")
 @login_required
+@conditional_get(_dashboard_signal)
 def dashboard():
     user = session["user"]
-    bookings = CarBooking.query.filter_by(
+    from sqlalchemy.orm import joinedload
+    bookings = cached_all(CarBooking.query.options(joinedload(CarBooking.car)).filter_by(
         employee_username=user["username"]
-    ).order_by(CarBooking.created_at.desc()).all()
+    ).order_by(CarBooking.created_at.desc()), tables=("cars",))
     return render_template("cars/dashboard.html", bookings=bookings, user=user)
 
 
 @cars_bp.route("/cars/new", methods=["GET", "POST"])
 @login_required
 def new_booking():
-    from datetime import date
     user = session["user"]
     managers = get_managers()
-    all_cars = Car.query.filter_by(is_active=True).all()
-    car_states = _get_car_states()
+    makes = [m for (m,) in cached_all(
+        db.session.query(Car.make).filter_by(is_active=True).distinct().order_by(Car.make))]
 
     if request.method == "POST":
         try:
@@ -115,29 +127,24 @@ def new_booking():
                 "error"
             )
             return render_template("cars/booking_form.html",
-                           user=user, managers=managers,
-                           all_cars=all_cars, car_states=car_states,
-                           today=date.today())
+                           user=user, managers=managers, makes=makes)
 
         car_id = request.form.get("car_id", "").strip()
-        if not car_id:
+        car = db.session.get(Car, int(car_id)) if car_id.isdigit() else None
+        if car is None or not car.is_active:
             flash("Please select a vehicle.", "error")
             return render_template("cars/booking_form.html",
-                           user=user, managers=managers,
-                           all_cars=all_cars, car_states=car_states,
-                           today=date.today())
+                           user=user, managers=managers, makes=makes)
 
-        if car_states.get(int(car_id), {}).get("status") == "borrowed":
+        if CarBooking.query.filter_by(car_id=car.id, status="borrowed").first():
             flash("That vehicle is currently out. Please choose another.", "error")
             return render_template("cars/booking_form.html",
-                           user=user, managers=managers,
-                           all_cars=all_cars, car_states=car_states,
-                           today=date.today())
+                           user=user, managers=managers, makes=makes)
 
         lang = request.form.get("active_language", "en")
         booking = CarBooking(
             booking_number=generate_booking_number(),
-            car_id=int(car_id),
+            car_id=car.id,
             employee_username=user["username"],
             employee_name=user["full_name"],
             employee_name_ar=request.form.get("employee_name_ar", "").strip(),
@@ -164,9 +171,98 @@ def new_booking():
         return redirect(url_for("cars.dashboard"))
 
     return render_template("cars/booking_form.html",
-                           user=user, managers=managers,
-                           all_cars=all_cars, car_states=car_states,
-                           today=date.today())
+                           user=user, managers=managers, makes=makes)
+
+
+def _parse_datetime(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M") if value else None
+    except ValueError:
+        return None
+
+
+def _car_json(car, state, today):
+    return {
+        "id": car.id,
+        "plate": car.plate_number,
+        "plateAr": car.plate_number_ar or "",
+        "make": car.make,
+        "model": car.model,
+        "year": car.year,
+        "color": car.color or "",
+        "colorAr": car.color_ar or "",
+        "seats": car.seats,
+        "image": car.image_url(),
+        "thumb": car.thumb_url(),
+        "mileage": car.current_mileage or 0,
+        "majorService": car.last_major_maintenance.strftime("%b %d, %Y") if car.last_major_maintenance else "",
+        "minorService": car.last_minor_maintenance.strftime("%b %d, %Y") if car.last_minor_maintenance else "",
+        "registrationExpiry": car.registration_expiry.strftime("%d %b %Y") if car.registration_expiry else "",
+        "registrationDays": (car.registration_expiry - today).days if car.registration_expiry else None,
+        "status": state.get("status", "free"),
+        "borrower": state.get("borrower", ""),
+        "lastBorrower": state.get("last_borrower", ""),
+        "lastNote": state.get("last_return_note", ""),
+    }
+
+
+@cars_bp.route("/cars/api/cars")
+@login_required
+def api_cars():
+    """One page of active cars for the booking form's picker.
+
+    Query: q (plate, make or model), make, seats (minimum), available=1 to
+    hide cars that are out, from/to (YYYY-MM-DDTHH:MM) to also hide cars
+    with a booking planned in that window, page.
+    """
+    from datetime import date
+    from flask import jsonify
+    from sqlalchemy import or_
+    from sqlalchemy.orm import selectinload
+    query = Car.query.filter_by(is_active=True)
+
+    q = request.args.get("q", "").strip()
+    if q:
+        like = f"%{q}%"
+        query = query.filter(or_(Car.plate_number.ilike(like), Car.plate_number_ar.ilike(like),
+                                 Car.make.ilike(like), Car.model.ilike(like)))
+    make = request.args.get("make", "").strip()
+    if make:
+        query = query.filter(Car.make == make)
+    seats = request.args.get("seats", 0, type=int)
+    if seats:
+        query = query.filter(Car.seats >= seats)
+
+    busy = []
+    if request.args.get("available") == "1":
+        busy.append(CarBooking.status == "borrowed")
+    window_from = _parse_datetime(request.args.get("from", ""))
+    window_to = _parse_datetime(request.args.get("to", ""))
+    if window_from and window_to:
+        if window_to < window_from:
+            return jsonify({"ok": False, "error": "to must not be before from"}), 400
+        busy.append(CarBooking.status.in_(["pending", "borrowed"])
+                    & CarBooking.planned_departure.between(window_from, window_to))
+    if busy:
+        taken = db.session.query(CarBooking.car_id).filter(or_(*busy))
+        query = query.filter(~Car.id.in_(taken))
+
+    pagination = query.options(selectinload(Car.last_return)).order_by(
+        Car.plate_number
+    ).paginate(
+        page=request.args.get("page", 1, type=int),
+        per_page=current_app.config.get("CAR_PICKER_PAGE_SIZE", 24),
+        error_out=False,
+    )
+    states = _get_car_states(pagination.items)
+    today = date.today()
+    return jsonify({
+        "ok": True,
+        "cars": [_car_json(car, states.get(car.id, {}), today) for car in pagination.items],
+        "page": pagination.page,
+        "pages": pagination.pages,
+        "total": pagination.total,
+    })
 
 
 @cars_bp.route("/cars/booking/<int:id>")
@@ -189,6 +285,36 @@ def admin_bookings():
                            bookings=bookings, status_filter=status_filter)
 
 
+@cars_bp.route("/admin/cars/bookings/bulk-status", methods=["POST"])
+@login_required
+@admin_required
+def admin_bulk_status():
+    """Apply many booking status changes in one transaction.
+
+    Body: {"transitions": [
+        {"id": 1, "status": "borrowed", "actual_departure": "2024-05-01T08:30"},
+        {"id": 2, "status": "returned", "odometer_return": 48210,
+         "actual_return": "2024-05-01T17:05", "return_note": ""},
+        {"id": 3, "status": "archived"}]}
+    Each row is checked on its own; the valid ones are applied together and
+    the response has one result per row, in order.
+    """
+    from flask import jsonify
+    from app.cars.bulk import MAX_TRANSITIONS, apply_transitions
+    payload = request.get_json(silent=True) or {}
+    items = payload.get("transitions")
+    if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+        return jsonify({"ok": False, "error": "transitions must be a list of objects"}), 400
+    if not items or len(items) > MAX_TRANSITIONS:
+        return jsonify({"ok": False, "error": f"give between 1 and {MAX_TRANSITIONS} transitions"}), 400
+
+    results = apply_transitions(items, recorded_by=session["user"]["username"])
+    db.session.commit()
+    applied = sum(1 for r in results if r["ok"])
+    return jsonify({"ok": True, "applied": applied, "failed": len(results) - applied,
+                    "results": results})
+
+
 @cars_bp.route("/admin/cars/bookings/<int:id>/status", methods=["GET", "POST"])
 @login_required
 @admin_required
@@ -247,7 +373,10 @@ def admin_update_status(id):
                 booking.actual_return = actual_return_dt
                 booking.return_note = request.form.get("return_note", "").strip()
                 booking.status = "returned"
-                booking.car.current_mileage = float(odometer)
+                km = record_reading(booking.car, float(odometer), "return", booking=booking,
+                                    recorded_by=session["user"]["username"])
+                record_return(booking, km)
+                refresh_alerts(booking.car_id)
                 db.session.commit()
                 flash(
                     f"تم تسجيل إرجاع الحجز {booking.booking_number} بنجاح." if _ar()
@@ -285,10 +414,13 @@ def admin_update_status(id):
 @admin_required
 def admin_fleet():
     from datetime import date
-    cars = Car.query.order_by(Car.created_at.desc()).all()
-    car_states = _get_car_states()
-    return render_template("cars/admin/fleet.html", cars=cars,
-                           car_states=car_states, today=date.today())
+    from sqlalchemy.orm import selectinload
+    from app.cars.compliance import alerts_by_car
+    cars = cached_all(Car.query.options(selectinload(Car.last_return)).order_by(Car.created_at.desc()),
+                      tables=("car_bookings",))
+    car_states = _get_car_states(cars)
+    return render_template("cars/admin/fleet.html", cars=cars, car_states=car_states,
+                           alerts=alerts_by_car(), today=date.today())
 
 
 @cars_bp.route("/admin/cars/fleet/new", methods=["GET", "POST"])
@@ -300,11 +432,10 @@ def admin_add_car():
         if "plate_image" in request.files:
             file = request.files["plate_image"]
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                upload_path = os.path.join(
-                    current_app.root_path, "static", "uploads", "cars", filename)
-                file.save(upload_path)
+                filename = save_upload(file)
+                enqueue("cars.make_thumbnail", {"name": filename})
         mileage_val = request.form.get("current_mileage", "").strip()
+        reading = float(mileage_val) if mileage_val else 0
         car = Car(
             plate_number=request.form["plate_number"].strip().upper(),
             plate_number_ar=request.form.get("plate_number_ar", "").strip(),
@@ -316,12 +447,17 @@ def admin_add_car():
             seats=int(request.form.get("seats", 5)),
             plate_image=filename,
             is_active=True,
-            current_mileage=float(mileage_val) if mileage_val else 0,
+            current_mileage=0,
             last_major_maintenance=_parse_date(request.form.get("last_major_maintenance", "")),
             last_minor_maintenance=_parse_date(request.form.get("last_minor_maintenance", "")),
             registration_expiry=_parse_date(request.form.get("registration_expiry", "")),
         )
         db.session.add(car)
+        db.session.flush()  # car.id for the odometer log
+        if reading:
+            record_reading(car, reading, "initial", recorded_by=session["user"]["username"])
+        refresh_alerts(car.id)
+        bump_version(FLEET)
         db.session.commit()
         flash(
             f"تمت إضافة السيارة {car.plate_number} إلى الأسطول." if _ar()
@@ -341,11 +477,11 @@ def admin_edit_car(id):
         if "plate_image" in request.files:
             file = request.files["plate_image"]
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                upload_path = os.path.join(
-                    current_app.root_path, "static", "uploads", "cars", filename)
-                file.save(upload_path)
-                car.plate_image = filename
+                filename = save_upload(file)
+                if filename != car.plate_image:
+                    car.plate_image = filename
+                    car.plate_thumb = ""
+                    enqueue("cars.make_thumbnail", {"name": filename})
         mileage_val = request.form.get("current_mileage", "").strip()
         car.plate_number = request.form["plate_number"].strip().upper()
         car.plate_number_ar = request.form.get("plate_number_ar", "").strip()
@@ -356,10 +492,15 @@ def admin_edit_car(id):
         car.color_ar = request.form.get("color_ar", "").strip()
         car.seats = int(request.form.get("seats", 5))
         car.is_active = "is_active" in request.form
-        car.current_mileage = float(mileage_val) if mileage_val else car.current_mileage
+        if mileage_val:
+            record_reading(car, float(mileage_val), "fleet_edit",
+                           recorded_by=session["user"]["username"])
         car.last_major_maintenance = _parse_date(request.form.get("last_major_maintenance", ""))
         car.last_minor_maintenance = _parse_date(request.form.get("last_minor_maintenance", ""))
         car.registration_expiry = _parse_date(request.form.get("registration_expiry", ""))
+        db.session.flush()
+        refresh_alerts(car.id)
+        bump_version(FLEET)
         db.session.commit()
         flash(
             f"تم تحديث بيانات السيارة {car.plate_number}." if _ar()
@@ -376,6 +517,9 @@ def admin_edit_car(id):
 def admin_toggle_car(id):
     car = Car.query.get_or_404(id)
     car.is_active = not car.is_active
+    db.session.flush()
+    refresh_alerts(car.id)
+    bump_version(FLEET)
     db.session.commit()
     if _ar():
         state = "تم تفعيلها" if car.is_active else "تم إيقافها"
@@ -389,6 +533,7 @@ def admin_toggle_car(id):
 @cars_bp.route("/admin/cars/reports")
 @login_required
 @admin_required
+@use_replica()
 def admin_reports():
     report_type = request.args.get("type", "car")
     selected_id  = request.args.get("selected_id", "all")
@@ -462,11 +607,54 @@ def admin_reports():
                            report_title=report_title)
 
 
+ANALYTICS_RANGES = (30, 90, 365)
+
+
+@cars_bp.route("/admin/cars/analytics")
+@login_required
+@admin_required
+@use_replica()
+def admin_analytics():
+    from datetime import date
+    from app.cars.rollups import fleet_usage
+    from app.cars.odometer import mileage_by_employee
+    days = request.args.get("days", 365, type=int)
+    if days not in ANALYTICS_RANGES:
+        days = 365
+    end = date.today()
+    start = end - timedelta(days=days - 1)
+    per_car, per_day = fleet_usage(start, end)
+    # Inactive cars with no use in the window would only dilute utilization.
+    inactive = [c for c in per_car if not c.is_active and not c.days_used]
+    per_car = [c for c in per_car if c.is_active or c.days_used]
+    capacity = days * 86400
+    totals = {
+        "trips": sum(c.trips for c in per_car),
+        "hours": sum(c.seconds_out for c in per_car) / 3600,
+        "km": sum(c.km for c in per_car),
+        "utilization": (sum(c.seconds_out for c in per_car) / (capacity * len(per_car)) * 100)
+                       if per_car else 0,
+    }
+    by_day = {d.day: d.seconds_out / 3600 for d in per_day}
+    series = [(start + timedelta(days=i), by_day.get(start + timedelta(days=i), 0))
+              for i in range(days)]
+    peak_hours = max((h for _, h in series), default=0)
+    drivers = mileage_by_employee(datetime.combine(start, datetime.min.time()),
+                                  datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    return render_template("cars/admin/analytics.html",
+                           per_car=per_car, inactive=inactive, series=series,
+                           totals=totals, drivers=drivers,
+                           capacity=capacity, peak_hours=peak_hours,
+                           days=days, ranges=ANALYTICS_RANGES, start=start, end=end)
+
+
 @cars_bp.route("/admin/cars/reports/print")
 @login_required
 @admin_required
+@use_replica()
 def admin_reports_print():
-    from datetime import date, datetime as dt
+    from sqlalchemy import func
+    from app.streaming import stream_page, stream_rows
     report_type = request.args.get("type", "car")
     selected_id  = request.args.get("selected_id", "all")
     date_from    = request.args.get("date_from", "")
@@ -500,16 +688,36 @@ def admin_reports_print():
         except ValueError:
             pass
 
-    bookings = query.order_by(CarBooking.planned_departure.desc()).all()
-
-    if report_type == "user" and selected_id != "all" and bookings:
-        report_title = f"{bookings[0].employee_name}"
-
-    return render_template("cars/admin/report_print.html",
-                           bookings=bookings,
-                           report_type=report_type,
-                           selected_id=selected_id,
-                           date_from=date_from,
-                           date_to=date_to,
-                           report_title=report_title,
-                           now=datetime.utcnow())
+    # Totals come from one aggregate query; the rows themselves are streamed.
+    status = CarBooking.status
+    totals = query.with_entities(
+        func.count(),
+        func.count().filter(status == "returned"),
+        func.count().filter(status == "borrowed"),
+        func.count().filter(status == "pending"),
+        func.count().filter(func.coalesce(CarBooking.return_note, "") != ""),
+        func.count().filter(CarBooking.actual_departure.is_(None)),
+    ).one()
+    stats = {
+        "total":     totals[0],
+        "returned":  totals[1],
+        "borrowed":  totals[2],
+        "pending":   totals[3],
+        "noted":     totals[4],
+        "planned_only": totals[5],
+    }
+
+    ordered = query.order_by(CarBooking.planned_departure.desc())
+    if report_type == "user" and selected_id != "all" and stats["total"]:
+        report_title = ordered.with_entities(CarBooking.employee_name).limit(1).scalar()
+
+    return stream_page("cars/admin/report_print.html",
+                       bookings=stream_rows(ordered),
+                       cars_by_id={c.id: c for c in cars},
+                       stats=stats,
+                       report_type=report_type,
+                       selected_id=selected_id,
+                       date_from=date_from,
+                       date_to=date_to,
+                       report_title=report_title,
+                       now=datetime.utcnow())
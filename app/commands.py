@@ -0,0 +1,257 @@
+import os
+import click
+from flask import current_app
+
+
+@click.command("init-db")
+def init_db_command():
+    """Create or upgrade the schema and seed an empty fleet. Run once per
+    deploy, before the app servers start."""
+    from app.schema import init_db
+    init_db(echo=click.echo)
+    click.echo("Database ready.")
+
+
+@click.command("build-assets")
+def build_assets_command():
+    """Fingerprint and precompress app/static and write manifest.json."""
+    from app.assets import build
+    manifest = build(current_app.static_folder, echo=click.echo)
+    click.echo(f"{len(manifest)} assets in manifest.")
+
+
+@click.command("compile-templates")
+def compile_templates_command():
+    """Precompile every template into the Jinja bytecode cache."""
+    if not current_app.config.get("JINJA_BYTECODE_CACHE_DIR"):
+        raise click.ClickException("JINJA_BYTECODE_CACHE_DIR is not set.")
+    from app.jinjacache import precompile
+    compiled, failed = precompile(current_app, echo=click.echo)
+    click.echo(f"Compiled {compiled} templates into {current_app.config['JINJA_BYTECODE_CACHE_DIR']}.")
+    if failed:
+        raise SystemExit(1)
+
+
+@click.command("worker")
+@click.option("--threads", type=int, default=None, help="Jobs run in parallel.")
+@click.option("--poll", type=float, default=None, help="Seconds between polls when idle.")
+def worker_command(threads, poll):
+    """Run queued and recurring background jobs until stopped."""
+    import logging
+    from app.jobs import Worker
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(threadName)s %(message)s")
+    cfg = current_app.config
+    Worker(current_app._get_current_object(),
+           threads=threads or cfg.get("JOB_WORKER_THREADS", 4),
+           poll=poll or cfg.get("JOB_POLL_SECONDS", 2.0)).run()
+
+
+@click.command("rebuild-car-usage")
+def rebuild_car_usage_command():
+    """Recompute the per-car daily usage rollup from returned bookings."""
+    from app.cars.rollups import rebuild
+    rebuild(echo=click.echo)
+
+
+@click.command("backfill-odometer-log")
+def backfill_odometer_log_command():
+    """Log odometer readings for returns made before the log existed."""
+    from app.cars.odometer import backfill
+    backfill(echo=click.echo)
+
+
+@click.command("refresh-car-alerts")
+def refresh_car_alerts_command():
+    """Rebuild the fleet compliance alerts now instead of waiting for the nightly job."""
+    from app import db
+    from app.cars.compliance import refresh_alerts
+    count = refresh_alerts()
+    db.session.commit()
+    click.echo(f"{count} open fleet alerts.")
+
+
+@click.command("sweep-car-images")
+@click.option("--thumbnails", is_flag=True, help="Also generate missing thumbnails.")
+def sweep_car_images_command(thumbnails):
+    """Delete car photos no car uses any more."""
+    from app import db
+    from app.cars.images import make_thumbnail, sweep_orphans
+    from app.cars.models import Car
+    if thumbnails:
+        names = {name for (name,) in db.session.query(Car.plate_image).filter(
+            Car.plate_image != "", Car.plate_thumb == "")}
+        made = sum(1 for name in names if make_thumbnail(name))
+        db.session.commit()
+        click.echo(f"Generated {made} thumbnails.")
+    sweep_orphans(current_app.config.get("CAR_IMAGE_GRACE_SECONDS", 3600), echo=click.echo)
+
+
+@click.command("compact-notifications")
+@click.option("--days", type=int, default=None,
+              help="Delete read notifications older than this many days.")
+@click.option("--compact-days", type=int, default=None,
+              help="Only collapse notifications older than this many days.")
+@click.option("--batch", type=int, default=None, help="Rows per transaction.")
+def compact_notifications_command(days, compact_days, batch):
+    """Purge old read notifications and collapse repeats into digest rows."""
+    from app.helpdesk.maintenance import purge_read_notifications, compact_notifications
+    cfg = current_app.config
+    days = days if days is not None else cfg.get("NOTIFICATION_RETENTION_DAYS", 90)
+    if compact_days is None:
+        compact_days = cfg.get("NOTIFICATION_COMPACT_AFTER_DAYS", 7)
+    batch = batch or cfg.get("NOTIFICATION_BATCH_SIZE", 1000)
+    purged = purge_read_notifications(days, batch=batch)
+    digests = compact_notifications(compact_days, batch=batch)
+    click.echo(f"Purged {purged} read notifications older than {days} days.")
+    click.echo(f"Compacted {digests} notification groups into digest rows.")
+
+
+@click.command("sweep-sessions")
+@click.option("--batch", type=int, default=1000, show_default=True, help="Rows per transaction.")
+def sweep_sessions_command(batch):
+    """Delete expired server-side sessions in batches."""
+    from app.sessions import sweep_expired
+    click.echo(f"Removed {sweep_expired(batch=batch)} expired sessions.")
+
+
+@click.command("create-indexes")
+def create_indexes_command():
+    """Build missing model indexes with CREATE INDEX CONCURRENTLY."""
+    from app.schema import create_indexes
+    built = create_indexes(echo=click.echo)
+    click.echo(f"Built {len(built)} index(es)." if built else "All indexes present.")
+
+
+@click.command("check-query-plans")
+def check_query_plans_command():
+    """EXPLAIN the hot queries and fail if any does not search its index."""
+    from app.queryplans import HOT_QUERIES, check_query_plans
+    failures = check_query_plans()
+    for name, index, used in failures:
+        click.echo(f"FAIL  {name}: expected {index}, plan uses {', '.join(used) or 'no index condition'}")
+    click.echo(f"{len(HOT_QUERIES) - len(failures)}/{len(HOT_QUERIES)} hot queries use their index.")
+    if failures:
+        raise SystemExit(1)
+
+
+@click.command("check-query-cache")
+def check_query_cache_command():
+    """Drive the benchmark routes through the live query cache and check
+    that writes from another connection invalidate it."""
+    from app import bench
+    failures = bench.check_cache(current_app, echo=click.echo)
+    for failure in failures:
+        click.echo(f"FAIL  {failure}")
+    click.echo("Query cache OK." if not failures else f"{len(failures)} check(s) failed.")
+    if failures:
+        raise SystemExit(1)
+
+
+@click.command("check-replica")
+def check_replica_command():
+    """Report whether report queries would be served by the replica."""
+    from app import db
+    from app.replica import BIND, replica_lag
+    if BIND not in (current_app.config.get("SQLALCHEMY_BINDS") or {}):
+        raise click.ClickException("REPLICA_DATABASE_URL is not set.")
+    limit = current_app.config.get("REPLICA_MAX_LAG_SECONDS", 5)
+    try:
+        lag = replica_lag(db.engines[BIND])
+    except Exception as exc:
+        click.echo(f"Replica unreachable, reports fall back to the primary: {exc}")
+        raise SystemExit(1)
+    state = "in use" if lag <= limit else "too far behind, reports use the primary"
+    click.echo(f"Replica lag {lag:.1f}s (limit {limit}s): {state}.")
+    if lag > limit:
+        raise SystemExit(1)
+
+    # Streamed reports fetch their rows after the view (and so use_replica)
+    # has returned; the statement must already be running on the replica.
+    from sqlalchemy import event
+    from app.models import LeaveRequest
+    from app.replica import use_replica
+    from app.streaming import stream_rows
+    statements = []
+
+    def _record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engines[BIND], "before_cursor_execute", _record)
+    try:
+        with use_replica():
+            rows = stream_rows(LeaveRequest.query.limit(1))
+        next(rows, None)
+    finally:
+        event.remove(db.engines[BIND], "before_cursor_execute", _record)
+        db.session.rollback()
+    if not any("leave_requests" in s for s in statements):
+        click.echo("Streamed report rows are read from the primary.")
+        raise SystemExit(1)
+    click.echo("Streamed report rows are read from the replica.")
+
+
+@click.command("seed-bench")
+@click.option("--users", default=500, show_default=True)
+@click.option("--leave", default=50000, show_default=True, help="Leave requests.")
+@click.option("--cars", default=200, show_default=True)
+@click.option("--bookings", default=30000, show_default=True)
+@click.option("--tickets", default=20000, show_default=True)
+@click.option("--messages", default=3, show_default=True, help="Average replies per ticket.")
+@click.option("--notifications", default=300000, show_default=True)
+@click.option("--years", default=3, show_default=True, help="Spread rows over this many years.")
+@click.option("--seed", "seed_value", default=42, show_default=True)
+def seed_bench_command(users, leave, cars, bookings, tickets, messages,
+                       notifications, years, seed_value):
+    """Bulk-insert synthetic rows for load benchmarking. Never run on production."""
+    if current_app.config.get("APP_ENV") == "production":
+        raise click.ClickException("Refusing to seed benchmark data in production.")
+    from app import bench
+    bench.seed(users=users, leave=leave, cars=cars, bookings=bookings, tickets=tickets,
+               messages=messages, notifications=notifications, years=years,
+               seed_value=seed_value, echo=click.echo)
+
+
+@click.command("bench")
+@click.option("--iterations", default=50, show_default=True)
+@click.option("--warmup", default=5, show_default=True)
+@click.option("--output", default=None,
+              help="Write results here (default: instance/bench_baseline.json).")
+@click.option("--compare", "compare_path", default=None,
+              help="Baseline JSON to compare against.")
+@click.option("--threshold", default=20.0, show_default=True,
+              help="Percent growth in p95 or query count that counts as a regression.")
+def bench_command(iterations, warmup, output, compare_path, threshold):
+    """Drive the key routes through the test client and record latency
+    percentiles and query counts."""
+    from app import bench
+    results = bench.run(current_app, iterations=iterations, warmup=warmup, echo=click.echo)
+    if output is None:
+        os.makedirs(current_app.instance_path, exist_ok=True)
+        output = os.path.join(current_app.instance_path, "bench_baseline.json")
+    bench.save(output, results)
+    click.echo(f"Wrote {output}")
+    if compare_path:
+        regressions = bench.compare(bench.load(compare_path), results,
+                                    threshold=threshold, echo=click.echo)
+        if regressions:
+            click.echo(f"Regressed: {', '.join(regressions)}")
+            raise SystemExit(1)
+
+
+def init_app(app):
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(build_assets_command)
+    app.cli.add_command(compile_templates_command)
+    app.cli.add_command(worker_command)
+    app.cli.add_command(compact_notifications_command)
+    app.cli.add_command(rebuild_car_usage_command)
+    app.cli.add_command(backfill_odometer_log_command)
+    app.cli.add_command(refresh_car_alerts_command)
+    app.cli.add_command(sweep_car_images_command)
+    app.cli.add_command(sweep_sessions_command)
+    app.cli.add_command(create_indexes_command)
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(check_query_cache_command)
+    app.cli.add_command(check_replica_command)
+    app.cli.add_command(seed_bench_command)
+    app.cli.add_command(bench_command)
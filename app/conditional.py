@@ -0,0 +1,68 @@
+import hashlib
+import os
+from functools import wraps
+from flask import current_app, make_response, request, session
+
+# Conditional GET for pages users reload to check on status. Each view gets a
+# "signal" function that returns a cheap fingerprint of the rows it shows
+# (row count, max updated_at, version counters). If the browser's ETag still
+# matches we answer 304 before the view runs any real query or renders.
+#
+# The ETag also covers everything else that changes the HTML: the user and
+# their role flags, the navbar unread count, the UI language, the query
+# string and the deployed code (ETAG_SALT). A request with pending flash
+# messages is always rendered in full and gets no ETag, so a cached copy
+# never replays (or swallows) a flash.
+
+
+def _code_version(root):
+    latest = 0
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if d not in ("uploads", "__pycache__")]
+        for name in files:
+            if name.endswith((".py", ".html", ".json")):
+                latest = max(latest, os.stat(os.path.join(dirpath, name)).st_mtime_ns)
+    return str(latest)
+
+
+def conditional_get(signal):
+    """Decorator: `signal(**view_kwargs)` returns a hashable fingerprint of
+    the view's data, or None to skip conditional handling for this request."""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if request.method != "GET" or session.get("_flashes"):
+                return f(*args, **kwargs)
+            fingerprint = signal(**kwargs)
+            if fingerprint is None:
+                return f(*args, **kwargs)
+
+            from app import nav_globals
+            user = session.get("user", {})
+            nav = nav_globals()
+            material = repr((
+                current_app.config.get("ETAG_SALT"),
+                user.get("username"), user.get("is_admin"),
+                nav["is_helpdesk_staff"], nav["unread_notifications"],
+                session.get("lang", "en"), request.full_path, fingerprint,
+            ))
+            etag = hashlib.sha1(material.encode()).hexdigest()
+
+            if etag in request.if_none_match:
+                response = make_response("", 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            # Always revalidate; the page is per-user so shared caches must not keep it.
+            response.headers["Cache-Control"] = "private, no-cache"
+            response.vary.add("Cookie")
+            return response
+        return decorated
+    return decorator
+
+
+def init_app(app):
+    app.config.setdefault(
+        "ETAG_SALT", os.environ.get("APP_VERSION") or _code_version(app.root_path))
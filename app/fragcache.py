@@ -0,0 +1,90 @@
+import threading
+from collections import OrderedDict
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+# {% cache "name", key1, key2, ... %} ... {% endcache %}
+#
+# Renders the body once per distinct (name, keys) and replays the markup
+# afterwards. Keys must list *every* input the body depends on (language,
+# role flags, active endpoint, ...); anything left out will be served stale.
+# The cache is per worker, bounded LRU, and emptied on every restart.
+
+
+class FragmentCache:
+    def __init__(self, maxsize=512, enabled=True):
+        self.maxsize = maxsize
+        self.enabled = enabled
+        self.on_lookup = None   # optional callback(name, hit) for metrics
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get_or_render(self, name, keys, render):
+        if not self.enabled:
+            return render()
+        try:
+            key = (name,) + tuple(keys)
+            hash(key)
+        except TypeError:
+            return render()
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+        if value is not None:
+            self._notify(name, True)
+            return value
+        value = render()
+        with self._lock:
+            self.misses += 1
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        self._notify(name, False)
+        return value
+
+    def _notify(self, name, hit):
+        if self.on_lookup is not None:
+            self.on_lookup(name, hit)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize,
+                    "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions}
+
+
+class FragmentCacheExtension(Extension):
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=FragmentCache())
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        name = parser.parse_expression()
+        keys = []
+        while parser.stream.skip_if("comma"):
+            keys.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        call = self.call_method("_render", [name, nodes.List(keys)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, name, keys, caller):
+        return self.environment.fragment_cache.get_or_render(name, keys, caller)
+
+
+def init_app(app):
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    cache = app.jinja_env.fragment_cache
+    cache.maxsize = app.config.get("TEMPLATE_FRAGMENT_CACHE_SIZE", 512)
+    cache.enabled = app.config.get("TEMPLATE_FRAGMENT_CACHE", True)
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.batching import LOCK_TIMEOUT, run_batches
+
+
+def purge_read_notifications(days, batch=1000, max_batches=None):
+    """Delete read notifications older than `days`. Returns rows deleted."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    return run_batches(
+        "DELETE FROM notifications WHERE id IN ("
+        "  SELECT id FROM notifications"
+        "  WHERE is_read AND created_at < :cutoff"
+        "  ORDER BY id LIMIT :batch FOR UPDATE SKIP LOCKED"
+        ")",
+        {"cutoff": cutoff, "batch": batch},
+        max_batches,
+    )
+
+
+def compact_notifications(days, batch=1000, max_batches=None):
+    """Collapse repeated notifications older than `days` for the same recipient
+    and ticket link into the newest such row, accumulating repeat_count. The
+    digest stays unread if any collapsed row was unread. Walks the table by id
+    so each batch only looks at the next `batch` candidate rows. Returns the
+    number of digest rows written."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    params = {"cutoff": cutoff, "batch": batch, "after": 0}
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        try:
+            db.session.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+            seen, last_id, written = db.session.execute(text(
+                "WITH candidates AS ("
+                "  SELECT id, recipient_username, link FROM notifications"
+                "  WHERE id > :after AND link <> '' AND created_at < :cutoff"
+                "  ORDER BY id LIMIT :batch FOR UPDATE SKIP LOCKED"
+                "), keepers AS ("
+                "  SELECT c.id, (SELECT max(k.id) FROM notifications k"
+                "                WHERE k.recipient_username = c.recipient_username"
+                "                  AND k.link = c.link AND k.created_at < :cutoff) AS keep_id"
+                "  FROM candidates c"
+                "), doomed AS ("
+                "  DELETE FROM notifications n USING keepers k"
+                "  WHERE n.id = k.id AND k.keep_id > k.id"
+                "  RETURNING k.keep_id, n.repeat_count, n.is_read"
+                "), merged AS ("
+                "  SELECT keep_id, sum(repeat_count) AS extra, bool_or(NOT is_read) AS any_unread"
+                "  FROM doomed GROUP BY keep_id"
+                "), digests AS ("
+                "  UPDATE notifications n"
+                "  SET repeat_count = n.repeat_count + merged.extra,"
+                "      is_read = n.is_read AND NOT merged.any_unread"
+                "  FROM merged WHERE n.id = merged.keep_id"
+                "  RETURNING n.id"
+                ") "
+                "SELECT (SELECT count(*) FROM candidates), (SELECT max(id) FROM candidates),"
+                "       (SELECT count(*) FROM digests)"
+            ), params).one()
+            db.session.commit()
+        except OperationalError:
+            db.session.rollback()
+            break
+        batches += 1
+        total += written
+        if seen < batch:
+            break
+        params["after"] = last_id
+    return total
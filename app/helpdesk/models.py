@@ -28,6 +28,10 @@ class HelpDeskStaff(db.Model):
 
 class HelpDeskTicket(db.Model):
     __tablename__ = "helpdesk_tickets"
+    __table_args__ = (
+        db.Index("ix_helpdesk_tickets_category_id_status_priority_updated_at",
+                 "category_id", "status", "priority", "updated_at"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     ticket_number = db.Column(db.String(20), unique=True, nullable=False)
     title = db.Column(db.String(200), nullable=False)
@@ -80,14 +84,19 @@ class TicketMessage(db.Model):
 
 class Notification(db.Model):
     __tablename__ = "notifications"
+    __table_args__ = (
+        db.Index("ix_notifications_recipient_username_is_read",
+                 "recipient_username", "is_read"),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    recipient_username = db.Column(db.String(50), nullable=False, index=True)
+    recipient_username = db.Column(db.String(50), nullable=False)
     title = db.Column(db.String(200), nullable=False)
     title_ar = db.Column(db.String(400), default="")
     body = db.Column(db.Text, default="")
     body_ar = db.Column(db.Text, default="")
     link = db.Column(db.String(500), default="")
     is_read = db.Column(db.Boolean, default=False)
+    repeat_count = db.Column(db.Integer, default=1, nullable=False)  # >1 once compacted into a digest
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
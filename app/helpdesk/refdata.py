@@ -0,0 +1,50 @@
+from collections import namedtuple
+from app.cache import reference_cache, bump_version
+from app.helpdesk.models import HelpDeskCategory
+
+CATEGORIES = "helpdesk_categories"
+# Version row only (staff are not cached here): bumped when staff are added,
+# edited or toggled, so ticket pages listing them stop answering 304.
+STAFF = "helpdesk_staff"
+
+# Detached snapshot of a category row; safe to share across requests.
+CategoryRef = namedtuple(
+    "CategoryRef", "id name name_ar department department_ar is_active"
+)
+
+
+def _load_categories():
+    rows = HelpDeskCategory.query.order_by(HelpDeskCategory.name).all()
+    return tuple(
+        CategoryRef(c.id, c.name, c.name_ar, c.department, c.department_ar, c.is_active)
+        for c in rows
+    )
+
+
+def all_categories():
+    return reference_cache.get(CATEGORIES, _load_categories)
+
+
+def active_categories():
+    return [c for c in all_categories() if c.is_active]
+
+
+def get_category(cat_id):
+    for c in all_categories():
+        if c.id == cat_id:
+            return c
+    return None
+
+
+def category_ids_for_department(department):
+    return [c.id for c in all_categories() if c.department == department]
+
+
+def departments(active_only=False):
+    cats = active_categories() if active_only else all_categories()
+    return sorted({c.department for c in cats})
+
+
+def invalidate_categories():
+    """Mark category data as changed. Caller is responsible for committing."""
+    bump_version(CATEGORIES)
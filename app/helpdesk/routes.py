@@ -4,11 +4,16 @@ from flask import (
     session, flash, abort
 )
 from app import db
+from app.cache import bump_version, cached_all, current_version
+from app.conditional import conditional_get
+from app.jobs import enqueue
 from app.helpdesk import helpdesk_bp
 from app.helpdesk.models import (
     HelpDeskCategory, HelpDeskStaff, HelpDeskTicket,
     TicketMessage, Notification, generate_ticket_number
 )
+from app.helpdesk import refdata
+from app.replica import use_replica
 
 
 # ─── Helpers ────────────────────────────────────────────────────────────────
@@ -65,17 +70,27 @@ def notify(recipient, title, title_ar, body, body_ar, link):
 
 # ─── User Routes ─────────────────────────────────────────────────────────────
 
+def _dashboard_signal():
+    from sqlalchemy import func
+    counts = db.session.query(
+        func.count(HelpDeskTicket.id), func.max(HelpDeskTicket.updated_at)
+    ).filter_by(created_by_username=session["user"]["username"]).one()
+    return tuple(counts) + (current_version(refdata.CATEGORIES),)
+
+
 @helpdesk_bp.route("/helpdesk")
 @login_required
+@conditional_get(_dashboard_signal)
 def dashboard():
     user = session["user"]
     status_filter = request.args.get("status", "all")
-    query = HelpDeskTicket.query.filter_by(
+    from sqlalchemy.orm import joinedload
+    query = HelpDeskTicket.query.options(joinedload(HelpDeskTicket.category)).filter_by(
         created_by_username=user["username"]
     ).order_by(HelpDeskTicket.created_at.desc())
     if status_filter != "all":
         query = query.filter_by(status=status_filter)
-    tickets = query.all()
+    tickets = cached_all(query, tables=("helpdesk_categories",))
     return render_template(
         "helpdesk/dashboard.html",
         tickets=tickets,
@@ -87,9 +102,7 @@ def dashboard():
 @login_required
 def new_ticket():
     user = session["user"]
-    categories = HelpDeskCategory.query.filter_by(is_active=True).order_by(
-        HelpDeskCategory.name
-    ).all()
+    categories = refdata.active_categories()
 
     if request.method == "POST":
         cat_id = request.form.get("category_id", "").strip()
@@ -121,21 +134,16 @@ def new_ticket():
         db.session.add(ticket)
         db.session.flush()  # get ticket.id for URL
 
-        # Notify all active staff in that department
-        category = HelpDeskCategory.query.get(int(cat_id))
-        dept_staff = HelpDeskStaff.query.filter_by(
-            department=category.department, is_active=True
-        ).all()
-        link = url_for("helpdesk.ticket_detail", id=ticket.id, _external=False)
-        for s in dept_staff:
-            notify(
-                recipient=s.username,
-                title=f"New Ticket: {ticket.ticket_number}",
-                title_ar=f"تذكرة جديدة: {ticket.ticket_number}",
-                body=title,
-                body_ar=ticket.title_ar or title,
-                link=link,
-            )
+        # Notify all active staff in that department (fanned out by the worker)
+        category = refdata.get_category(int(cat_id))
+        enqueue("helpdesk.notify_department", {
+            "department": category.department,
+            "title": f"New Ticket: {ticket.ticket_number}",
+            "title_ar": f"تذكرة جديدة: {ticket.ticket_number}",
+            "body": title,
+            "body_ar": ticket.title_ar or title,
+            "link": url_for("helpdesk.ticket_detail", id=ticket.id, _external=False),
+        })
 
         db.session.commit()
         flash(
@@ -149,8 +157,27 @@ def new_ticket():
                            user=user, categories=categories)
 
 
+def _ticket_signal(id):
+    from sqlalchemy import func
+    ticket = db.session.query(
+        HelpDeskTicket.updated_at, HelpDeskTicket.status, HelpDeskTicket.priority,
+        HelpDeskTicket.assigned_to_username,
+    ).filter_by(id=id).first()
+    if ticket is None:
+        return None  # let the view 404
+    messages = db.session.query(
+        func.count(TicketMessage.id), func.max(TicketMessage.created_at)
+    ).filter_by(ticket_id=id).one()
+    staff_dept = db.session.query(HelpDeskStaff.department).filter_by(
+        username=session["user"]["username"], is_active=True
+    ).scalar()
+    return (tuple(ticket), tuple(messages), staff_dept,
+            current_version(refdata.CATEGORIES), current_version(refdata.STAFF))
+
+
 @helpdesk_bp.route("/helpdesk/ticket/<int:id>")
 @login_required
+@conditional_get(_ticket_signal)
 def ticket_detail(id):
     ticket = HelpDeskTicket.query.get_or_404(id)
     user = session["user"]
@@ -220,15 +247,14 @@ def user_reply(id):
         )
     else:
         dept = ticket.category.department if ticket.category else ""
-        for s in HelpDeskStaff.query.filter_by(department=dept, is_active=True).all():
-            notify(
-                recipient=s.username,
-                title=f"New reply on {ticket.ticket_number}",
-                title_ar=f"رد جديد على {ticket.ticket_number}",
-                body=body[:120],
-                body_ar=body[:120],
-                link=link,
-            )
+        enqueue("helpdesk.notify_department", {
+            "department": dept,
+            "title": f"New reply on {ticket.ticket_number}",
+            "title_ar": f"رد جديد على {ticket.ticket_number}",
+            "body": body[:120],
+            "body_ar": body[:120],
+            "link": link,
+        })
 
     db.session.commit()
     flash("Reply sent." if not _ar() else "تم إرسال الرد.", "success")
@@ -252,7 +278,7 @@ def staff_dashboard():
     if staff:
         dept = staff.department
         # Get category IDs for this department
-        cat_ids = [c.id for c in HelpDeskCategory.query.filter_by(department=dept).all()]
+        cat_ids = refdata.category_ids_for_department(dept)
         query = HelpDeskTicket.query.filter(
             HelpDeskTicket.category_id.in_(cat_ids)
         )
@@ -393,15 +419,13 @@ def admin_dashboard():
     if priority_filter != "all":
         query = query.filter_by(priority=priority_filter)
     if dept_filter != "all":
-        cat_ids = [c.id for c in HelpDeskCategory.query.filter_by(
-            department=dept_filter).all()]
+        cat_ids = refdata.category_ids_for_department(dept_filter)
         query = query.filter(HelpDeskTicket.category_id.in_(cat_ids))
 
     tickets = query.order_by(HelpDeskTicket.updated_at.desc()).all()
 
     # Get unique departments from categories
-    departments = db.session.query(HelpDeskCategory.department).distinct().all()
-    departments = [d[0] for d in departments]
+    departments = refdata.departments()
 
     return render_template(
         "helpdesk/admin/dashboard.html",
@@ -430,11 +454,12 @@ def admin_categories():
                 department_ar=request.form.get("department_ar", "").strip(),
             )
             db.session.add(cat)
+            refdata.invalidate_categories()
             db.session.commit()
             flash(f"Category '{name}' added.", "success")
         return redirect(url_for("helpdesk.admin_categories"))
 
-    categories = HelpDeskCategory.query.order_by(HelpDeskCategory.name).all()
+    categories = refdata.all_categories()
     return render_template("helpdesk/admin/categories.html", categories=categories)
 
 
@@ -448,6 +473,7 @@ def admin_edit_category(id):
         cat.name_ar = request.form.get("name_ar", cat.name_ar).strip()
         cat.department = request.form.get("department", cat.department).strip()
         cat.department_ar = request.form.get("department_ar", cat.department_ar).strip()
+        refdata.invalidate_categories()
         db.session.commit()
         flash(f"Category '{cat.name}' updated.", "success")
         return redirect(url_for("helpdesk.admin_categories"))
@@ -460,6 +486,7 @@ def admin_edit_category(id):
 def admin_toggle_category(id):
     cat = HelpDeskCategory.query.get_or_404(id)
     cat.is_active = not cat.is_active
+    refdata.invalidate_categories()
     db.session.commit()
     state = "activated" if cat.is_active else "deactivated"
     flash(f"Category '{cat.name}' {state}.", "success")
@@ -472,10 +499,7 @@ def admin_toggle_category(id):
 def admin_staff():
     staff_members = HelpDeskStaff.query.order_by(HelpDeskStaff.full_name).all()
     # Departments from active categories only (no free text)
-    depts = db.session.query(HelpDeskCategory.department).filter_by(
-        is_active=True
-    ).distinct().order_by(HelpDeskCategory.department).all()
-    departments = [d[0] for d in depts]
+    departments = refdata.departments(active_only=True)
     return render_template(
         "helpdesk/admin/staff_members.html",
         staff_members=staff_members,
@@ -501,6 +525,7 @@ def admin_add_staff():
         existing.full_name = full_name
         existing.department = department
         existing.full_name_ar = request.form.get("full_name_ar", "").strip()
+        bump_version(refdata.STAFF)
         db.session.commit()
         flash(f"Staff member '{username}' reactivated/updated.", "success")
     else:
@@ -511,6 +536,7 @@ def admin_add_staff():
             department=department,
         )
         db.session.add(staff)
+        bump_version(refdata.STAFF)
         db.session.commit()
         flash(f"Staff member '{username}' added.", "success")
 
@@ -523,6 +549,7 @@ def admin_add_staff():
 def admin_toggle_staff(id):
     staff = HelpDeskStaff.query.get_or_404(id)
     staff.is_active = not staff.is_active
+    bump_version(refdata.STAFF)
     db.session.commit()
     state = "activated" if staff.is_active else "deactivated"
     flash(f"Staff member '{staff.username}' {state}.", "success")
@@ -534,6 +561,7 @@ def admin_toggle_staff(id):
 @helpdesk_bp.route("/admin/helpdesk/reports")
 @login_required
 @admin_required
+@use_replica()
 def admin_reports():
     from datetime import datetime, timedelta
 
@@ -545,7 +573,7 @@ def admin_reports():
     priority_filter = request.args.get("priority", "all")
 
     # Selector lists
-    categories = HelpDeskCategory.query.order_by(HelpDeskCategory.name).all()
+    categories = refdata.all_categories()
     staff_members = HelpDeskStaff.query.order_by(HelpDeskStaff.full_name).all()
 
     # Unique requesters — PostgreSQL requires DISTINCT ON column to lead ORDER BY
@@ -563,7 +591,7 @@ def admin_reports():
     if report_type == "category":
         if selected_id != "all":
             query = query.filter_by(category_id=int(selected_id))
-            cat = HelpDeskCategory.query.get(int(selected_id))
+            cat = refdata.get_category(int(selected_id))
             report_title = cat.name if cat else selected_id
         else:
             report_title = "All Categories"
@@ -626,6 +654,7 @@ def admin_reports():
 @helpdesk_bp.route("/admin/helpdesk/reports/print")
 @login_required
 @admin_required
+@use_replica()
 def admin_reports_print():
     from datetime import datetime, timedelta
 
@@ -648,7 +677,7 @@ def admin_reports_print():
     if report_type == "category":
         if selected_id != "all":
             query = query.filter_by(category_id=int(selected_id))
-            cat = HelpDeskCategory.query.get(int(selected_id))
+            cat = refdata.get_category(int(selected_id))
             report_title = cat.name if cat else selected_id
         else:
             report_title = "All Categories"
@@ -688,11 +717,35 @@ def admin_reports_print():
         except ValueError:
             pass
 
-    tickets = query.order_by(HelpDeskTicket.created_at.desc()).all()
+    # Totals come from one aggregate query; the rows themselves are streamed.
+    from sqlalchemy import func, select
+    from app.streaming import stream_page, stream_rows
+    status = HelpDeskTicket.status
+    totals = query.with_entities(
+        func.count(),
+        func.count().filter(status == "open"),
+        func.count().filter(status == "in_progress"),
+        func.count().filter(status == "resolved"),
+        func.count().filter(status == "closed"),
+        func.count().filter(HelpDeskTicket.priority == "urgent"),
+    ).one()
+    stats = dict(zip(("total", "open", "in_progress", "resolved", "closed", "urgent"), totals))
+
+    # Reply counts ride along with each row instead of loading t.messages.
+    replies = (
+        select(func.count(TicketMessage.id))
+        .where(TicketMessage.ticket_id == HelpDeskTicket.id)
+        .scalar_subquery()
+    )
+    tickets = stream_rows(
+        query.add_columns(replies).order_by(HelpDeskTicket.created_at.desc())
+    )
 
-    return render_template(
+    return stream_page(
         "helpdesk/admin/report_print.html",
         tickets=tickets,
+        stats=stats,
+        categories={c.id: c for c in refdata.all_categories()},
         report_type=report_type,
         selected_id=selected_id,
         date_from=date_from,
@@ -709,11 +762,18 @@ def admin_reports_print():
 @helpdesk_bp.route("/notifications")
 @login_required
 def notifications():
+    from flask import current_app
     user = session["user"]
-    notifs = Notification.query.filter_by(
+    page = request.args.get("page", 1, type=int)
+    pagination = Notification.query.filter_by(
         recipient_username=user["username"]
-    ).order_by(Notification.created_at.desc()).all()
-    return render_template("helpdesk/notifications.html", notifs=notifs)
+    ).order_by(Notification.created_at.desc(), Notification.id.desc()).paginate(
+        page=page,
+        per_page=current_app.config.get("NOTIFICATIONS_PER_PAGE", 30),
+        error_out=False,
+    )
+    return render_template("helpdesk/notifications.html",
+                           notifs=pagination.items, pagination=pagination)
 
 
 @helpdesk_bp.route("/notifications/<int:id>/read", methods=["POST"])
@@ -724,7 +784,42 @@ def mark_read(id):
         abort(403)
     notif.is_read = True
     db.session.commit()
-    return redirect(url_for("helpdesk.notifications"))
+    return redirect(url_for("helpdesk.notifications", page=request.form.get("page", 1, type=int)))
+
+
+@helpdesk_bp.route("/api/notifications/read", methods=["POST"])
+@login_required
+def api_mark_read():
+    """Mark a batch of the current user's notifications as read.
+
+    Body: {"ids": [1, 2, ...]} or {"all": true}.
+    Returns the number of rows changed and the new unread count.
+    """
+    from flask import jsonify
+    username = session["user"]["username"]
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"ok": False, "error": "body must be a JSON object"}), 400
+
+    query = Notification.query.filter_by(recipient_username=username, is_read=False)
+    if payload.get("all") is not True:
+        raw_ids = payload.get("ids")
+        if not isinstance(raw_ids, list) or any(isinstance(i, bool) for i in raw_ids):
+            return jsonify({"ok": False, "error": "ids must be a list of integers"}), 400
+        try:
+            ids = {int(i) for i in raw_ids}
+        except (TypeError, ValueError):
+            return jsonify({"ok": False, "error": "ids must be integers"}), 400
+        if not ids or len(ids) > 1000:
+            return jsonify({"ok": False, "error": "give between 1 and 1000 ids"}), 400
+        query = query.filter(Notification.id.in_(ids))
+
+    updated = query.update({"is_read": True}, synchronize_session=False)
+    db.session.commit()
+    unread = Notification.query.filter_by(
+        recipient_username=username, is_read=False
+    ).count()
+    return jsonify({"ok": True, "updated": updated, "unread": unread})
 
 
 @helpdesk_bp.route("/notifications/read-all", methods=["POST"])
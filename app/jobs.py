@@ -0,0 +1,239 @@
+import json
+import logging
+import os
+import signal
+import socket
+import threading
+import traceback
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from app import db
+
+log = logging.getLogger(__name__)
+
+# Background jobs stored in Postgres; no broker needed.
+#
+# enqueue() adds a row in the caller's transaction, so a job only becomes
+# visible once the request that created it commits. `flask worker` runs a
+# pool of threads that claim due jobs with FOR UPDATE SKIP LOCKED, so any
+# number of worker processes can share the table. A failed job is retried
+# with exponential backoff until it reaches max_attempts, then left as
+# 'failed' for the admin page. Recurring jobs live in job_schedules; each
+# tick one worker wins the UPDATE ... RETURNING and enqueues the next run.
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class Job(db.Model):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        db.Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, default="{}")
+    status = db.Column(db.String(20), default=QUEUED, nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, default=5, nullable=False)
+    run_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    locked_by = db.Column(db.String(100), nullable=True)
+    last_error = db.Column(db.Text, default="")
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+
+class JobSchedule(db.Model):
+    """Next due time for each recurring job."""
+    __tablename__ = "job_schedules"
+    name = db.Column(db.String(100), primary_key=True)
+    interval_seconds = db.Column(db.Integer, nullable=False)
+    next_run_at = db.Column(db.DateTime, nullable=False)
+
+
+# name -> (function, max_attempts)
+TASKS = {}
+# name -> interval in seconds
+RECURRING = {}
+
+
+def task(name, max_attempts=5, every=None):
+    """Register a job function. `every` (seconds) also schedules it to run
+    on that interval."""
+    def decorator(f):
+        TASKS[name] = (f, max_attempts)
+        if every:
+            RECURRING[name] = every
+        return f
+    return decorator
+
+
+def enqueue(name, payload=None, delay=None, run_at=None):
+    """Queue `name` to run once. Caller is responsible for committing."""
+    if run_at is None:
+        run_at = datetime.utcnow() + timedelta(seconds=delay or 0)
+    job = Job(name=name, payload=json.dumps(payload or {}), run_at=run_at,
+              max_attempts=TASKS[name][1] if name in TASKS else 5)
+    db.session.add(job)
+    return job
+
+
+def backoff(attempts, base, cap):
+    return min(cap, base * 2 ** (attempts - 1))
+
+
+CLAIM_SQL = text(
+    "UPDATE jobs SET status = 'running', attempts = attempts + 1, "
+    "locked_at = now() at time zone 'utc', locked_by = :me "
+    "WHERE id = ("
+    "  SELECT id FROM jobs WHERE status = 'queued' AND run_at <= now() at time zone 'utc'"
+    "  ORDER BY run_at, id LIMIT 1 FOR UPDATE SKIP LOCKED"
+    ") RETURNING id, name, payload, attempts, max_attempts"
+)
+
+DUE_SCHEDULES_SQL = text(
+    "UPDATE job_schedules SET next_run_at = now() at time zone 'utc' "
+    "  + interval_seconds * interval '1 second' "
+    "WHERE name IN ("
+    "  SELECT name FROM job_schedules WHERE next_run_at <= now() at time zone 'utc'"
+    "  FOR UPDATE SKIP LOCKED"
+    ") RETURNING name"
+)
+
+REQUEUE_STALE_SQL = text(
+    "UPDATE jobs SET status = 'queued', locked_at = NULL, locked_by = NULL, "
+    "last_error = 'worker lost while running' "
+    "WHERE status = 'running' AND locked_at < now() at time zone 'utc' - :timeout * interval '1 second'"
+)
+
+
+class Worker:
+    def __init__(self, app, threads=4, poll=2.0):
+        self.app = app
+        self.threads = threads
+        self.poll = poll
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+        cfg = app.config
+        self.backoff_base = cfg.get("JOB_BACKOFF_SECONDS", 30)
+        self.backoff_cap = cfg.get("JOB_BACKOFF_MAX_SECONDS", 3600)
+        self.timeout = cfg.get("JOB_TIMEOUT_SECONDS", 1800)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, lambda *_: self.stopping.set())
+        signal.signal(signal.SIGINT, lambda *_: self.stopping.set())
+        with self.app.app_context():
+            self.sync_schedules()
+        pool = [threading.Thread(target=self._loop, name=f"job-{i}", daemon=True)
+                for i in range(self.threads)]
+        for t in pool:
+            t.start()
+        log.info("Worker %s started with %d threads", self.name, self.threads)
+        while not self.stopping.wait(self.poll * 5):
+            with self.app.app_context():
+                self.tick()
+        for t in pool:
+            t.join()
+
+    def sync_schedules(self):
+        """Create or update schedule rows for the registered recurring jobs."""
+        for name, every in RECURRING.items():
+            db.session.execute(text(
+                "INSERT INTO job_schedules (name, interval_seconds, next_run_at) "
+                "VALUES (:name, :every, now() at time zone 'utc') "
+                "ON CONFLICT (name) DO UPDATE SET interval_seconds = EXCLUDED.interval_seconds"
+            ), {"name": name, "every": every})
+        db.session.commit()
+
+    def tick(self):
+        """Enqueue due recurring jobs and recover jobs from dead workers."""
+        try:
+            for (name,) in db.session.execute(DUE_SCHEDULES_SQL).fetchall():
+                enqueue(name)
+            db.session.execute(REQUEUE_STALE_SQL, {"timeout": self.timeout})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            log.exception("Scheduler tick failed")
+        finally:
+            db.session.remove()
+
+    def _loop(self):
+        while not self.stopping.is_set():
+            with self.app.app_context():
+                try:
+                    ran = self.run_one()
+                except Exception:
+                    log.exception("Job loop error")
+                    ran = False
+                finally:
+                    db.session.remove()
+            if not ran:
+                self.stopping.wait(self.poll)
+
+    def run_one(self):
+        """Claim and run one due job. Returns False when the queue is empty."""
+        row = db.session.execute(CLAIM_SQL, {"me": self.name}).first()
+        db.session.commit()
+        if row is None:
+            return False
+
+        entry = TASKS.get(row.name)
+        try:
+            if entry is None:
+                raise LookupError(f"No task registered as {row.name!r}")
+            entry[0](**json.loads(row.payload or "{}"))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            error = traceback.format_exc(limit=5)
+            if row.attempts >= row.max_attempts or entry is None:
+                db.session.execute(text(
+                    "UPDATE jobs SET status = 'failed', last_error = :err, locked_by = NULL, "
+                    "finished_at = now() at time zone 'utc' WHERE id = :id"
+                ), {"id": row.id, "err": error})
+                log.error("Job %s #%d failed permanently", row.name, row.id)
+            else:
+                delay = backoff(row.attempts, self.backoff_base, self.backoff_cap)
+                db.session.execute(text(
+                    "UPDATE jobs SET status = 'queued', last_error = :err, locked_by = NULL, "
+                    "run_at = now() at time zone 'utc' + :delay * interval '1 second' WHERE id = :id"
+                ), {"id": row.id, "err": error, "delay": delay})
+                log.warning("Job %s #%d failed, retrying in %ds", row.name, row.id, delay)
+            db.session.commit()
+            return True
+
+        db.session.execute(text(
+            "UPDATE jobs SET status = 'done', locked_by = NULL, "
+            "finished_at = now() at time zone 'utc' WHERE id = :id"
+        ), {"id": row.id})
+        db.session.commit()
+        return True
+
+
+def queue_summary():
+    """Counts per job name and status, plus the oldest due queued job."""
+    rows = db.session.execute(text(
+        "SELECT name, status, count(*) AS n FROM jobs GROUP BY name, status ORDER BY name"
+    )).fetchall()
+    oldest = db.session.execute(text(
+        "SELECT min(run_at) FROM jobs WHERE status = 'queued' AND run_at <= now() at time zone 'utc'"
+    )).scalar()
+    return rows, oldest
+
+
+def purge_finished(days, batch=1000, max_batches=None):
+    """Delete finished jobs older than `days`. Failed jobs are kept."""
+    from app.batching import run_batches
+    return run_batches(
+        "DELETE FROM jobs WHERE id IN ("
+        "  SELECT id FROM jobs WHERE status = 'done'"
+        "  AND finished_at < now() at time zone 'utc' - :days * interval '1 day'"
+        "  ORDER BY id LIMIT :batch FOR UPDATE SKIP LOCKED)",
+        {"days": days, "batch": batch}, max_batches=max_batches,
+    )
+
+
+def init_app(app):
+    # Register the job functions so enqueue() and the worker both see them.
+    from app import tasks  # noqa: F401
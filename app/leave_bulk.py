@@ -0,0 +1,101 @@
+from datetime import datetime
+from sqlalchemy import text
+from app import db
+from app.batching import run_batches
+from app.cache import touch_tables
+
+# Bulk leave request status changes for the admin dashboard.
+#
+# A selection (up to MAX_IDS ticked rows) is one UPDATE in the request. A
+# filter ("every approved request departing before X") can match thousands
+# of rows, so it is queued as a LeaveBulkAction and the `leave.bulk_status`
+# job works through it in chunks with run_batches: each chunk is its own
+# short transaction that skips rows a user has locked, and records its
+# progress in the same transaction so the dashboard can poll it.
+
+MAX_IDS = 1000
+BATCH_SIZE = 500
+
+# target status -> statuses it may be reached from
+ALLOWED_FROM = {
+    "approved": ("pending",),
+    "archived": ("draft", "pending", "approved"),
+}
+
+
+def update_selected(ids, status):
+    """Move the given requests to `status` where the transition is allowed.
+    Returns the ids actually changed. Caller is responsible for committing."""
+    changed = db.session.execute(text(
+        "UPDATE leave_requests SET status = :status, updated_at = now() at time zone 'utc' "
+        "WHERE id = ANY(:ids) AND status = ANY(:allowed) RETURNING id"
+    ), {"status": status, "ids": list(ids), "allowed": list(ALLOWED_FROM[status])}).scalars().all()
+    if changed:
+        touch_tables("leave_requests")
+    return changed
+
+
+def _filter_params(action):
+    allowed = ALLOWED_FROM[action.target_status]
+    if action.filter_status:
+        allowed = [s for s in allowed if s == action.filter_status]
+    return {"status": action.target_status, "allowed": list(allowed), "before": action.before}
+
+
+def matching_count(action):
+    return db.session.execute(text(
+        "SELECT count(*) FROM leave_requests "
+        "WHERE status = ANY(:allowed) AND departure_datetime < :before"
+    ), _filter_params(action)).scalar()
+
+
+def queue_filter_action(status, before, filter_status, requested_by):
+    """Record and enqueue a filter-wide change. Caller is responsible for committing."""
+    from app.jobs import enqueue
+    from app.models import LeaveBulkAction
+    action = LeaveBulkAction(target_status=status, filter_status=filter_status or None,
+                             before=before, requested_by=requested_by)
+    action.total = matching_count(action)
+    db.session.add(action)
+    db.session.flush()
+    enqueue("leave.bulk_status", {"action_id": action.id})
+    return action
+
+
+def run_filter_action(action_id, batch=BATCH_SIZE):
+    """Apply a queued LeaveBulkAction chunk by chunk."""
+    from app.models import LeaveBulkAction
+    action = db.session.get(LeaveBulkAction, action_id)
+    if action is None or action.state == "done":
+        return
+    action.state = "running"
+    db.session.commit()
+    params = dict(_filter_params(action), batch=batch)
+
+    def progress(affected, total):
+        if affected:
+            touch_tables("leave_requests")
+        db.session.execute(text(
+            "UPDATE leave_bulk_actions SET done = done + :n WHERE id = :id"
+        ), {"n": affected, "id": action_id})
+
+    try:
+        run_batches(
+            "UPDATE leave_requests SET status = :status, updated_at = now() at time zone 'utc' "
+            "WHERE id IN ("
+            "  SELECT id FROM leave_requests"
+            "  WHERE status = ANY(:allowed) AND departure_datetime < :before"
+            "  ORDER BY id LIMIT :batch FOR UPDATE SKIP LOCKED)",
+            params, on_batch=progress,
+        )
+    except Exception:
+        db.session.rollback()
+        db.session.execute(text(
+            "UPDATE leave_bulk_actions SET state = 'failed', "
+            "finished_at = now() at time zone 'utc' WHERE id = :id"
+        ), {"id": action_id})
+        db.session.commit()
+        raise
+    action.skipped = matching_count(action)
+    action.state = "done"
+    action.finished_at = datetime.utcnow()
@@ -0,0 +1,123 @@
+import os
+import time
+from flask import Response, abort, g, has_request_context, request, session
+from flask import before_render_template, template_rendered
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# With PROMETHEUS_MULTIPROC_DIR set (see gunicorn.conf.py) every worker writes
+# its samples to mmap files in that directory and /metrics merges them, so a
+# scrape sees the whole server rather than whichever worker answered.
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by endpoint.",
+    ["endpoint", "method", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUEST_SQL_STATEMENTS = Histogram(
+    "http_request_sql_statements", "SQL statements issued per request.",
+    ["endpoint"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+SQL_STATEMENTS = Counter(
+    "sql_statements_total", "SQL statements executed.", ["endpoint"],
+)
+SQL_SECONDS = Counter(
+    "sql_statement_seconds_total", "Time spent executing SQL.", ["endpoint"],
+)
+FRAGMENT_CACHE = Counter(
+    "template_fragment_cache_total", "Template fragment cache lookups.",
+    ["fragment", "result"],
+)
+TEMPLATE_RENDER = Histogram(
+    "template_render_seconds", "Jinja template render time.", ["template"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+
+def _endpoint():
+    if has_request_context():
+        return request.endpoint or "<unmatched>"
+    return "<no-request>"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    endpoint = _endpoint()
+    SQL_STATEMENTS.labels(endpoint).inc()
+    SQL_SECONDS.labels(endpoint).inc(elapsed)
+    if has_request_context():
+        g.sql_statements = g.get("sql_statements", 0) + 1
+
+
+def _before_render(sender, template, context, **extra):
+    if has_request_context():
+        g.setdefault("metrics_render_start", []).append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    if not has_request_context():
+        return
+    starts = g.get("metrics_render_start")
+    if starts:
+        TEMPLATE_RENDER.labels(template.name or "<string>").observe(
+            time.perf_counter() - starts.pop())
+
+
+def _registry():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    from prometheus_client import REGISTRY
+    return REGISTRY
+
+
+def metrics_view():
+    from flask import current_app
+    allowed = current_app.config.get("METRICS_ALLOWED_IPS", ("127.0.0.1", "::1"))
+    # Behind nginx every request comes from the proxy's address; only trust
+    # it for direct connections (nginx also denies /metrics outright).
+    direct = request.remote_addr in allowed and "X-Forwarded-For" not in request.headers
+    if not direct and not session.get("user", {}).get("is_admin"):
+        abort(403)
+    return Response(generate_latest(_registry()), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_app(app):
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        g.sql_statements = 0
+
+    @app.after_request
+    def _record_request(response):
+        start = g.get("metrics_start")
+        if start is not None:
+            endpoint = _endpoint()
+            REQUEST_LATENCY.labels(endpoint, request.method, response.status_code).observe(
+                time.perf_counter() - start)
+            REQUEST_SQL_STATEMENTS.labels(endpoint).observe(g.get("sql_statements", 0))
+        return response
+
+    cache = getattr(app.jinja_env, "fragment_cache", None)
+    if cache is not None:
+        cache.on_lookup = lambda name, hit: FRAGMENT_CACHE.labels(
+            name, "hit" if hit else "miss").inc()
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -8,6 +8,12 @@ def generate_request_number():
 
 class LeaveRequest(db.Model):
     __tablename__ = "leave_requests"
+    __table_args__ = (
+        db.Index("ix_leave_requests_employee_username_created_at",
+                 "employee_username", "created_at"),
+        db.Index("ix_leave_requests_departure_datetime", "departure_datetime"),
+        db.Index("ix_leave_requests_status_departure_datetime", "status", "departure_datetime"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     request_number = db.Column(db.String(20), unique=True, nullable=False)
 
@@ -53,3 +59,26 @@ class LeaveRequest(db.Model):
             "approved": "badge-approved",
             "archived": "badge-archived",
         }.get(self.status, "badge-draft")
+
+
+class LeaveBulkAction(db.Model):
+    """A filter-wide status change run by the worker (see app/leave_bulk.py)."""
+    __tablename__ = "leave_bulk_actions"
+    id = db.Column(db.Integer, primary_key=True)
+    target_status = db.Column(db.String(20), nullable=False)
+    filter_status = db.Column(db.String(20), nullable=True)      # None = any status allowed
+    before = db.Column(db.DateTime, nullable=False)              # departure_datetime < before
+    requested_by = db.Column(db.String(50), nullable=False)
+    state = db.Column(db.String(20), default="queued", nullable=False)   # queued / running / done / failed
+    total = db.Column(db.Integer, default=0, nullable=False)     # matching rows when queued
+    done = db.Column(db.Integer, default=0, nullable=False)
+    skipped = db.Column(db.Integer, default=0, nullable=False)   # still matching at the end (locked by a user)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id, "status": self.target_status, "state": self.state,
+            "total": self.total, "done": self.done, "skipped": self.skipped,
+            "percent": round(100 * self.done / self.total) if self.total else 100,
+        }
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from app import db
+
+# The hottest filters in the app, written the way the routes issue them.
+# Each must be answerable from an index; see check_query_plans().
+HOT_QUERIES = [
+    ("car states: active bookings",
+     "SELECT * FROM car_bookings WHERE status IN ('pending', 'borrowed') "
+     "ORDER BY created_at DESC",
+     {}, "ix_car_bookings_status_car_id_actual_return"),
+    ("car last return per car",
+     "SELECT * FROM car_bookings WHERE car_id = :car_id AND status = 'returned' "
+     "ORDER BY actual_return DESC LIMIT 1",
+     {"car_id": 1}, "ix_car_bookings_status_car_id_actual_return"),
+    ("car bookings dashboard",
+     "SELECT * FROM car_bookings WHERE employee_username = :username "
+     "ORDER BY created_at DESC",
+     {"username": "bench.user"}, "ix_car_bookings_employee_username_created_at"),
+    ("leave dashboard",
+     "SELECT * FROM leave_requests WHERE employee_username = :username "
+     "ORDER BY created_at DESC",
+     {"username": "bench.user"}, "ix_leave_requests_employee_username_created_at"),
+    ("leave report date range",
+     "SELECT * FROM leave_requests WHERE departure_datetime >= :date_from "
+     "AND departure_datetime <= :date_to ORDER BY departure_datetime DESC",
+     {"date_from": datetime(2025, 1, 1), "date_to": datetime(2025, 1, 1) + timedelta(days=31)},
+     "ix_leave_requests_departure_datetime"),
+    ("help desk staff dashboard",
+     "SELECT * FROM helpdesk_tickets WHERE category_id IN (1, 2) AND status = 'open' "
+     "ORDER BY updated_at DESC",
+     {}, "ix_helpdesk_tickets_category_id_status_priority_updated_at"),
+    ("unread notification count",
+     "SELECT count(*) FROM notifications WHERE recipient_username = :username "
+     "AND is_read = false",
+     {"username": "bench.user"}, "ix_notifications_recipient_username_is_read"),
+]
+
+
+def _indexes_used(node, found):
+    """Indexes the plan searches with an Index Cond (a full index scan with
+    a Filter on top proves nothing about the filter being indexed)."""
+    if node.get("Index Name") and node.get("Index Cond"):
+        found.add(node["Index Name"])
+    for child in node.get("Plans", ()):
+        _indexes_used(child, found)
+    return found
+
+
+def check_query_plans():
+    """EXPLAIN each hot query and return [(name, expected index, [indexes
+    used])] for the ones whose plan does not search their index.
+
+    Sequential scans are disabled for the check so that a small seeded
+    database still gets index plans, but with them off the planner falls
+    back to scanning any index in full, so the check looks for the expected
+    index name with an Index Cond rather than for the absence of Seq Scan.
+    """
+    failures = []
+    try:
+        db.session.execute(text("SET LOCAL enable_seqscan = off"))
+        for name, sql, params, index in HOT_QUERIES:
+            plan = db.session.execute(text("EXPLAIN (FORMAT JSON) " + sql), params).scalar()
+            used = _indexes_used(plan[0]["Plan"], set())
+            if index not in used:
+                failures.append((name, index, sorted(used)))
+    finally:
+        db.session.rollback()
+    return failures
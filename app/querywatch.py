@@ -0,0 +1,142 @@
+import os
+import re
+import time
+import traceback
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Opt-in development/staging aid. Groups every SQL statement issued during a
+# request by its normalized shape; a shape repeated QUERYWATCH_REPEAT_THRESHOLD
+# times or more is almost always a lazy relationship or per-row helper
+# (Car.last_return_note, HelpDeskTicket.category, ...) called in a loop.
+
+_IN_LIST = re.compile(r"\bIN\s*\((?:[^()]|\([^()]*\))*\)", re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"%\(\w+\)s|%s|:\w+|\?")
+_SPACE = re.compile(r"\s+")
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request or query_budget() block exceeded its statement budget."""
+
+
+def normalize(statement):
+    sql = _IN_LIST.sub("IN (?)", statement)
+    sql = _STRING.sub("?", sql)
+    sql = _PARAM.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def _app_stack():
+    frames = [f for f in traceback.extract_stack()
+              if f.filename.startswith(_APP_DIR) and f.filename != __file__]
+    return "".join(traceback.format_list(frames[-8:]))
+
+
+class _Tracker:
+    def __init__(self):
+        self.total = 0
+        self.shapes = {}   # shape -> [count, stack at first repeat]
+
+    def record(self, statement):
+        self.total += 1
+        shape = normalize(statement)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            self.shapes[shape] = [1, None]
+        else:
+            entry[0] += 1
+            if entry[1] is None:
+                entry[1] = _app_stack()
+
+    def repeated(self, threshold):
+        return sorted(
+            ((shape, n, stack) for shape, (n, stack) in self.shapes.items() if n >= threshold),
+            key=lambda item: -item[1],
+        )
+
+
+_manual_trackers = []
+
+
+def _current_tracker():
+    if _manual_trackers:
+        return _manual_trackers[-1]
+    if has_request_context():
+        return g.get("querywatch")
+    return None
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("querywatch_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("querywatch_start")
+    if not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+    tracker = _current_tracker()
+    if tracker is None:
+        return
+    tracker.record(statement)
+    slow_ms = current_app.config.get("QUERYWATCH_SLOW_MS", 200)
+    if elapsed_ms >= slow_ms:
+        current_app.logger.warning(
+            "Slow query (%.0f ms): %s\n%s", elapsed_ms, _SPACE.sub(" ", statement), _app_stack())
+
+
+def _problems(tracker, label, max_statements=None, max_repeats=None):
+    cfg = current_app.config
+    threshold = max_repeats or cfg.get("QUERYWATCH_REPEAT_THRESHOLD", 5)
+    budget = max_statements or cfg.get("QUERYWATCH_MAX_STATEMENTS")
+    problems = []
+    for shape, count, stack in tracker.repeated(threshold):
+        current_app.logger.warning(
+            "Possible N+1 in %s: %d x %s\nFirst repeat at:\n%s", label, count, shape, stack or "")
+        problems.append(f"{count} x {shape}")
+    if budget and tracker.total > budget:
+        current_app.logger.warning(
+            "%s issued %d SQL statements (budget %d)", label, tracker.total, budget)
+        problems.append(f"{tracker.total} statements > budget {budget}")
+    return problems
+
+
+@contextmanager
+def query_budget(max_statements=None, max_repeats=None, label="block"):
+    """Track the statements issued inside the block (needs an app context)
+    and raise QueryBudgetExceeded if it breaks the budget, regardless of
+    QUERYWATCH_RAISE. Intended for tests and shell sessions."""
+    tracker = _Tracker()
+    _manual_trackers.append(tracker)
+    try:
+        yield tracker
+    finally:
+        _manual_trackers.remove(tracker)
+    problems = _problems(tracker, label, max_statements, max_repeats)
+    if problems:
+        raise QueryBudgetExceeded(f"{label}: " + "; ".join(problems))
+
+
+def init_app(app):
+    @app.before_request
+    def _start_tracking():
+        g.querywatch = _Tracker()
+
+    @app.after_request
+    def _report(response):
+        from flask import request
+        tracker = g.pop("querywatch", None)
+        if tracker is not None:
+            label = request.endpoint or request.path
+            problems = _problems(tracker, label)
+            if problems and current_app.config.get("QUERYWATCH_RAISE"):
+                raise QueryBudgetExceeded(f"{label}: " + "; ".join(problems))
+        return response
@@ -0,0 +1,116 @@
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+# Read-only replica routing for report and export queries.
+#
+# REPLICA_DATABASE_URL adds a "replica" bind. Code wrapped in use_replica()
+# (a context manager that also works as a view decorator) sends its reads to
+# that bind; flushes and INSERT/UPDATE/DELETE statements always go to the
+# primary. Each worker checks the replica at most every REPLICA_CHECK_SECONDS
+# and falls back to the primary while it is unreachable or more than
+# REPLICA_MAX_LAG_SECONDS behind. Without a replica URL everything runs on
+# the primary exactly as before.
+#
+# Only use it for pages that can tolerate a few seconds of lag: a page shown
+# right after the user's own write should keep reading from the primary.
+
+BIND = "replica"
+_ROUTE_KEY = "replica_engine"
+
+LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class RoutingSession(Session):
+    """db.session class that honours use_replica() for reads."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = self.info.get(_ROUTE_KEY)
+        if (engine is not None and bind is None and not self._flushing
+                and not getattr(clause, "is_dml", False)):
+            return engine
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+
+class _Health:
+    def __init__(self):
+        self.checked_at = None
+        self.healthy = False
+        self.lag = None
+        self._lock = threading.Lock()
+
+    def mark_down(self):
+        with self._lock:
+            self.checked_at = time.monotonic()
+            self.healthy = False
+
+
+health = _Health()
+
+
+def replica_lag(engine):
+    """Seconds the replica is behind the primary (0 for a standalone server)."""
+    with engine.connect() as conn:
+        return float(conn.execute(LAG_SQL).scalar() or 0)
+
+
+def _replica_engine():
+    """The replica engine if configured and healthy, else None."""
+    from app import db
+    cfg = current_app.config
+    if BIND not in (cfg.get("SQLALCHEMY_BINDS") or {}):
+        return None
+    engine = db.engines[BIND]
+    now = time.monotonic()
+    if health.checked_at is not None and now - health.checked_at < cfg.get("REPLICA_CHECK_SECONDS", 10):
+        return engine if health.healthy else None
+
+    with health._lock:
+        health.checked_at = now
+        try:
+            health.lag = replica_lag(engine)
+            health.healthy = health.lag <= cfg.get("REPLICA_MAX_LAG_SECONDS", 5)
+            if not health.healthy:
+                current_app.logger.warning("Replica %.1fs behind; reading from primary.", health.lag)
+        except DBAPIError as exc:
+            health.healthy = False
+            current_app.logger.warning("Replica unavailable, reading from primary: %s", exc)
+    return engine if health.healthy else None
+
+
+def routed_to_replica():
+    """True inside an active use_replica() block."""
+    from app import db
+    return _ROUTE_KEY in db.session.info
+
+
+@contextmanager
+def use_replica():
+    """Route reads in this block (or decorated view) to the replica when it
+    is available. Nested use is fine; the outermost block decides."""
+    from app import db
+    info = db.session.info
+    if _ROUTE_KEY in info:
+        yield
+        return
+    engine = _replica_engine()
+    if engine is None:
+        yield
+        return
+    info[_ROUTE_KEY] = engine
+    try:
+        yield
+    except DBAPIError as exc:
+        if exc.connection_invalidated:
+            health.mark_down()
+        raise
+    finally:
+        info.pop(_ROUTE_KEY, None)
@@ -2,7 +2,10 @@ from functools import wraps
 from datetime import datetime, timedelta
 from flask import Blueprint, flash, redirect, render_template, request, session, url_for
 from . import db
+from .cache import cached_all
 from .auth import authenticate, get_managers
+from .conditional import conditional_get
+from .replica import use_replica
 from .models import LeaveRequest, generate_request_number
 
 main = Blueprint("main", __name__)
@@ -77,13 +80,20 @@ def ping():
     from flask import jsonify
     return jsonify({"ok": True})
 
+def _dashboard_signal():
+    from sqlalchemy import func
+    return db.session.query(
+        func.count(LeaveRequest.id), func.max(LeaveRequest.updated_at)
+    ).filter_by(employee_username=session["user"]["username"]).one()
+
 @main.route("/")
 @login_required
+@conditional_get(_dashboard_signal)
 def dashboard():
     user = session["user"]
-    records = LeaveRequest.query.filter_by(
+    records = cached_all(LeaveRequest.query.filter_by(
         employee_username=user["username"]
-    ).order_by(LeaveRequest.created_at.desc()).all()
+    ).order_by(LeaveRequest.created_at.desc()))
     return render_template("dashboard.html", user=user, records=records)
 
 @main.route("/leave/new", methods=["GET", "POST"])
@@ -259,8 +269,10 @@ def admin_dashboard():
     if status_filter != "all":
         query = query.filter_by(status=status_filter)
     records = query.all()
+    from .leave_bulk import MAX_IDS
     return render_template("admin/dashboard.html", records=records,
-                           user=session["user"], status_filter=status_filter)
+                           user=session["user"], status_filter=status_filter,
+                           bulk_max_ids=MAX_IDS)
 
 @main.route("/admin/leave/<int:id>")
 @login_required
@@ -286,9 +298,102 @@ def update_status(id):
     return redirect(url_for("main.admin_dashboard"))
 
 
+@main.route("/admin/leave/bulk-status", methods=["POST"])
+@login_required
+@admin_required
+def admin_bulk_status():
+    """Approve or archive many leave requests.
+
+    Body: {"status": "approved" | "archived", "ids": [1, 2, ...]} changes the
+    selection now and returns the ids changed. Or
+    {"status": ..., "filter": {"status": "approved", "before": "2024-05-31"}}
+    queues every request in that status departing before the date; the
+    response links to its progress.
+    """
+    from flask import jsonify
+    from .leave_bulk import ALLOWED_FROM, MAX_IDS, queue_filter_action, update_selected
+    payload = request.get_json(silent=True) or {}
+    status = payload.get("status")
+    if status not in ALLOWED_FROM:
+        return jsonify({"ok": False, "error": "status must be approved or archived"}), 400
+
+    if "filter" in payload:
+        flt = payload.get("filter") or {}
+        filter_status = flt.get("status") or None
+        if filter_status is not None and filter_status not in ALLOWED_FROM[status]:
+            return jsonify({"ok": False, "error": f"cannot change {filter_status} to {status}"}), 400
+        try:
+            before = datetime.strptime(flt.get("before", ""), "%Y-%m-%d")
+        except (TypeError, ValueError):
+            return jsonify({"ok": False, "error": "filter.before must be YYYY-MM-DD"}), 400
+        action = queue_filter_action(status, before, filter_status, session["user"]["username"])
+        db.session.commit()
+        return jsonify({"ok": True, "action": action.to_dict(),
+                        "progress_url": url_for("main.admin_bulk_progress", id=action.id)}), 202
+
+    if not isinstance(payload.get("ids"), list):
+        return jsonify({"ok": False, "error": "ids must be a list of integers"}), 400
+    try:
+        ids = {int(i) for i in payload["ids"]}
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "ids must be integers"}), 400
+    if not ids or len(ids) > MAX_IDS:
+        return jsonify({"ok": False, "error": f"give between 1 and {MAX_IDS} ids"}), 400
+    changed = update_selected(ids, status)
+    db.session.commit()
+    return jsonify({"ok": True, "updated": len(changed), "ids": sorted(changed),
+                    "skipped": sorted(ids - set(changed))})
+
+
+@main.route("/admin/leave/bulk-status/<int:id>")
+@login_required
+@admin_required
+def admin_bulk_progress(id):
+    from flask import jsonify
+    from .models import LeaveBulkAction
+    action = LeaveBulkAction.query.get_or_404(id)
+    return jsonify({"ok": True, "action": action.to_dict()})
+
+
+@main.route("/admin/jobs")
+@login_required
+@admin_required
+def admin_jobs():
+    from .jobs import Job, queue_summary
+    rows, oldest_due = queue_summary()
+    names = sorted({r.name for r in rows})
+    counts = {(r.name, r.status): r.n for r in rows}
+    failures = Job.query.filter_by(status="failed").order_by(Job.finished_at.desc()).limit(50).all()
+    retrying = Job.query.filter(Job.status == "queued", Job.attempts > 0).order_by(Job.run_at).limit(50).all()
+    return render_template("admin/jobs.html", names=names, counts=counts,
+                           oldest_due=oldest_due, failures=failures, retrying=retrying,
+                           now=datetime.utcnow())
+
+
+@main.route("/admin/jobs/<int:id>/retry", methods=["POST"])
+@login_required
+@admin_required
+def admin_retry_job(id):
+    from .jobs import Job
+    job = Job.query.get_or_404(id)
+    if job.status == "failed":
+        job.status = "queued"
+        job.attempts = 0
+        job.run_at = datetime.utcnow()
+        job.finished_at = None
+        db.session.commit()
+        flash(
+            f"أعيدت المهمة #{job.id} إلى قائمة الانتظار." if _ar()
+            else f"Job #{job.id} queued again.",
+            "success"
+        )
+    return redirect(url_for("main.admin_jobs"))
+
+
 @main.route("/admin/leave/reports")
 @login_required
 @admin_required
+@use_replica()
 def admin_leave_reports():
     from sqlalchemy import text
     report_type   = request.args.get("type", "employee")
@@ -378,8 +483,10 @@ def admin_leave_reports():
 @main.route("/admin/leave/reports/print")
 @login_required
 @admin_required
+@use_replica()
 def admin_leave_reports_print():
-    from sqlalchemy import text
+    from sqlalchemy import func
+    from .streaming import stream_page, stream_rows
     report_type   = request.args.get("type", "employee")
     selected_id   = request.args.get("selected_id", "all")
     date_from     = request.args.get("date_from", "")
@@ -409,22 +516,29 @@ def admin_leave_reports_print():
         except ValueError:
             pass
 
-    records = query.order_by(LeaveRequest.departure_datetime.desc()).all()
-
-    durations = [(r.return_datetime - r.departure_datetime).total_seconds() / 86400 for r in records]
-    avg_duration = round(sum(durations) / len(durations), 1) if durations else 0
+    # Totals come from one aggregate query; the rows themselves are streamed.
+    status = LeaveRequest.status
+    totals = query.with_entities(
+        func.count(),
+        func.count().filter(status == "approved"),
+        func.count().filter(status == "pending"),
+        func.count().filter(status == "draft"),
+        func.count().filter(status == "archived"),
+        func.avg(func.extract("epoch", LeaveRequest.return_datetime - LeaveRequest.departure_datetime)),
+    ).one()
     stats = {
-        "total":    len(records),
-        "approved": sum(1 for r in records if r.status == "approved"),
-        "pending":  sum(1 for r in records if r.status == "pending"),
-        "draft":    sum(1 for r in records if r.status == "draft"),
-        "archived": sum(1 for r in records if r.status == "archived"),
-        "avg_duration": avg_duration,
+        "total":    totals[0],
+        "approved": totals[1],
+        "pending":  totals[2],
+        "draft":    totals[3],
+        "archived": totals[4],
+        "avg_duration": round(float(totals[5]) / 86400, 1) if totals[5] is not None else 0,
     }
 
+    ordered = query.order_by(LeaveRequest.departure_datetime.desc())
     if report_type == "employee":
-        if selected_id != "all" and records:
-            report_title = f"{records[0].employee_name}"
+        if selected_id != "all" and stats["total"]:
+            report_title = ordered.with_entities(LeaveRequest.employee_name).limit(1).scalar()
         else:
             report_title = "All Employees"
     elif report_type == "department":
@@ -432,8 +546,8 @@ def admin_leave_reports_print():
     else:
         report_title = selected_id if selected_id != "all" else "All Managers"
 
-    return render_template("admin/report_print.html",
-        records=records, report_type=report_type, selected_id=selected_id,
+    return stream_page("admin/report_print.html",
+        records=stream_rows(ordered), report_type=report_type, selected_id=selected_id,
         date_from=date_from, date_to=date_to, status_filter=status_filter,
         report_title=report_title, stats=stats, now=datetime.utcnow())
 
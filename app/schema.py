@@ -0,0 +1,104 @@
+import re
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+from app import db
+
+# db.create_all() only creates missing tables. Columns added to a table after
+# it first shipped are handled here; every statement must be idempotent.
+UPGRADE_STATEMENTS = [
+    "ALTER TABLE notifications ADD COLUMN IF NOT EXISTS repeat_count INTEGER NOT NULL DEFAULT 1",
+    "ALTER TABLE cars ADD COLUMN IF NOT EXISTS plate_thumb VARCHAR(200) NOT NULL DEFAULT ''",
+]
+
+
+# Indexes since replaced by others on the models. create_indexes drops them
+# with DROP INDEX CONCURRENTLY, outside any transaction.
+RETIRED_INDEXES = [
+    "ix_notifications_recipient_username",  # covered by ix_notifications_recipient_username_is_read
+]
+
+
+# Arbitrary key for pg_advisory_xact_lock so concurrent init-db runs
+# (e.g. two containers starting together) seed the fleet only once.
+SEED_LOCK_KEY = 73110501
+
+
+def upgrade():
+    for stmt in UPGRADE_STATEMENTS:
+        db.session.execute(text(stmt))
+    db.session.commit()
+
+
+def init_db(echo=print):
+    """Create tables, apply column upgrades, build missing indexes and seed
+    placeholder cars into an empty fleet. Safe to run on every deploy."""
+    db.create_all()
+    upgrade()
+    create_indexes(echo=echo)
+    if seed_cars():
+        echo("Seeded placeholder cars.")
+
+
+def seed_cars():
+    """Seed 5 placeholder cars if the fleet is empty. Returns True if seeded."""
+    from app.cars.models import Car
+    db.session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SEED_LOCK_KEY})
+    if Car.query.count() > 0:
+        db.session.commit()
+        return False
+    placeholder_cars = [
+        Car(plate_number="12345 AB", make="Toyota", model="Land Cruiser",
+            year=2022, color="White", color_ar="أبيض", seats=7,
+            plate_number_ar="أ ب 12345"),
+        Car(plate_number="67890 CD", make="Nissan", model="Patrol",
+            year=2021, color="Silver", color_ar="فضي", seats=7,
+            plate_number_ar="ج د 67890"),
+        Car(plate_number="11223 EF", make="Toyota", model="Camry",
+            year=2023, color="Black", color_ar="أسود", seats=5,
+            plate_number_ar="هـ و 11223"),
+        Car(plate_number="44556 GH", make="Mitsubishi", model="Pajero",
+            year=2020, color="Grey", color_ar="رمادي", seats=7,
+            plate_number_ar="ج هـ 44556"),
+        Car(plate_number="77889 IJ", make="Ford", model="Explorer",
+            year=2022, color="Blue", color_ar="أزرق", seats=6,
+            plate_number_ar="ي ك 77889"),
+    ]
+    for car in placeholder_cars:
+        db.session.add(car)
+    db.session.commit()
+    return True
+
+
+def create_indexes(echo=print):
+    """Create every index declared on the models that the live database is
+    missing, using CREATE INDEX CONCURRENTLY so writes are never blocked.
+    Retired indexes are dropped the same way.
+
+    A concurrent build that failed part-way leaves an INVALID index behind;
+    those are dropped and rebuilt. Returns the names of indexes built.
+    """
+    built = []
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name in RETIRED_INDEXES:
+            if conn.execute(text("SELECT 1 FROM pg_class WHERE relname = :name"),
+                            {"name": name}).first() is not None:
+                echo(f"Dropping retired index {name}")
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+        for table in db.metadata.sorted_tables:
+            for index in sorted(table.indexes, key=lambda i: i.name):
+                state = conn.execute(text(
+                    "SELECT i.indisvalid FROM pg_class c "
+                    "JOIN pg_index i ON i.indexrelid = c.oid "
+                    "WHERE c.relname = :name"
+                ), {"name": index.name}).first()
+                if state is not None and state[0]:
+                    continue
+                if state is not None:
+                    echo(f"Dropping invalid index {index.name}")
+                    conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"'))
+                ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=conn.dialect)).strip()
+                ddl = re.sub(r"^CREATE (UNIQUE )?INDEX", r"CREATE \1INDEX CONCURRENTLY", ddl)
+                echo(f"Building {index.name} on {table.name}")
+                conn.execute(text(ddl))
+                built.append(index.name)
+    return built
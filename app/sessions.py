@@ -0,0 +1,85 @@
+from datetime import datetime
+from flask_session import Session
+from flask_session.sessions import SqlAlchemySessionInterface
+from sqlalchemy.dialects.postgresql import insert
+from itsdangerous import want_bytes
+from app import db
+from app.batching import run_batches
+
+
+class StoreSessionInterface(SqlAlchemySessionInterface):
+    """Flask-Session 0.5's SQLAlchemy backend, saving only what changed.
+
+    The stock save_session SELECTs, UPDATEs, commits and re-sends the cookie
+    on every response, and with use_signer it hands Werkzeug 3 a bytes
+    cookie value, which set_cookie rejects. This version skips the save
+    unless Flask says the cookie should be set (the session was modified, or
+    SESSION_REFRESH_EACH_REQUEST is on), upserts the row on its own
+    connection and signs the id as text.
+    """
+
+    def save_session(self, app, session, response):
+        if not self.should_set_cookie(app, session):
+            return
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        store_id = self.key_prefix + session.sid
+        table = self.sql_session_model.__table__
+        # Own connection and transaction: committing db.session here would
+        # also end the request's transaction, and with it the server-side
+        # cursor a streamed response is still reading from.
+        with self.db.engine.begin() as conn:
+            if not session:
+                conn.execute(table.delete().where(table.c.session_id == store_id))
+            else:
+                expires = self.get_expiration_time(app, session)
+                val = self.serializer.dumps(dict(session))
+                conn.execute(insert(table).values(session_id=store_id, data=val, expiry=expires)
+                             .on_conflict_do_update(index_elements=[table.c.session_id],
+                                                    set_={"data": val, "expiry": expires}))
+        if not session:
+            response.delete_cookie(app.config["SESSION_COOKIE_NAME"], domain=domain, path=path)
+            return
+
+        session_id = session.sid
+        if self.use_signer:
+            session_id = self._get_signer(app).sign(want_bytes(session.sid)).decode("utf-8")
+        response.set_cookie(
+            app.config["SESSION_COOKIE_NAME"], session_id,
+            expires=expires, httponly=self.get_cookie_httponly(app),
+            domain=domain, path=path, secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def init_app(app):
+    """Keep session data server-side; the cookie carries only a signed id.
+
+    SESSION_REFRESH_EACH_REQUEST is off, so the store and cookie are only
+    written when the session actually changes. check_session_timeout bumps
+    last_activity at most once per SESSION_ACTIVITY_GRANULARITY seconds.
+    """
+    if app.config.get("SESSION_TYPE") != "sqlalchemy":
+        Session(app)
+        return
+    app.session_interface = StoreSessionInterface(
+        app, app.config.get("SESSION_SQLALCHEMY", db),
+        app.config.get("SESSION_SQLALCHEMY_TABLE", "sessions"),
+        app.config.get("SESSION_KEY_PREFIX", "session:"),
+        app.config.get("SESSION_USE_SIGNER", False),
+        app.config.get("SESSION_PERMANENT", True),
+    )
+
+
+def sweep_expired(batch=1000, max_batches=None):
+    """Delete expired rows from the SQLAlchemy session store. Returns rows deleted."""
+    from flask import current_app
+    table = current_app.config.get("SESSION_SQLALCHEMY_TABLE", "sessions")
+    return run_batches(
+        f"DELETE FROM {table} WHERE id IN ("
+        f"  SELECT id FROM {table} WHERE expiry < :now"
+        "  ORDER BY id LIMIT :batch FOR UPDATE SKIP LOCKED"
+        ")",
+        {"now": datetime.utcnow(), "batch": batch},
+        max_batches,
+    )
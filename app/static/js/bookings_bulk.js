@@ -0,0 +1,93 @@
+// Bulk hand-over / return / archive on the car bookings page. Sends the
+// selected cards to the bulk status API in one request, then reloads, or
+// marks the cards whose change was rejected.
+document.addEventListener('DOMContentLoaded', function() {
+  const bar = document.getElementById('bulkBar');
+  if (!bar) return;
+  const statusEl = document.getElementById('bulkStatus');
+  const timeInput = document.getElementById('bulkTime');
+
+  const now = new Date();
+  now.setSeconds(0, 0);
+  timeInput.value = now.toISOString().slice(0, 16);
+
+  // Which current statuses each bulk action applies to.
+  const FROM = { borrowed: ['pending'], returned: ['borrowed'], archived: ['pending', 'returned'] };
+
+  function clearErrors() {
+    document.querySelectorAll('.bulk-error').forEach(function(el) { el.remove(); });
+  }
+
+  function showError(id, message) {
+    const box = document.querySelector('.bulk-select[value="' + id + '"]');
+    if (!box) return;
+    const card = box.closest('.booking-admin-card');
+    const note = document.createElement('div');
+    note.className = 'bulk-error';
+    note.textContent = message;
+    card.querySelector('.bac-actions').prepend(note);
+  }
+
+  bar.querySelectorAll('[data-bulk-status]').forEach(function(btn) {
+    btn.addEventListener('click', function() {
+      const status = btn.dataset.bulkStatus;
+      clearErrors();
+      const selected = Array.from(document.querySelectorAll('.bulk-select:checked'))
+        .filter(function(box) { return FROM[status].indexOf(box.dataset.status) !== -1; });
+      if (!selected.length) {
+        statusEl.textContent = bar.dataset.labelNone;
+        return;
+      }
+
+      const transitions = [];
+      let missing = false;
+      selected.forEach(function(box) {
+        const row = { id: parseInt(box.value, 10), status: status };
+        if (status === 'borrowed') row.actual_departure = timeInput.value;
+        if (status === 'returned') {
+          const odo = document.querySelector('.bulk-odometer[data-booking="' + box.value + '"]');
+          if (!odo || !odo.value.trim()) {
+            showError(box.value, bar.dataset.labelOdometer);
+            missing = true;
+            return;
+          }
+          row.odometer_return = parseFloat(odo.value);
+          row.actual_return = timeInput.value;
+        }
+        transitions.push(row);
+      });
+      if (missing) return;
+
+      btn.disabled = true;
+      fetch(bar.dataset.apiUrl, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ transitions: transitions })
+      }).then(function(resp) {
+        return resp.json().then(function(data) {
+          if (!resp.ok || !data.ok) throw new Error(data.error || ('HTTP ' + resp.status));
+          return data;
+        });
+      }).then(function(data) {
+        if (!data.failed) {
+          window.location.reload();
+          return;
+        }
+        data.results.forEach(function(r) { if (!r.ok) showError(r.id, r.error); });
+        statusEl.textContent = bar.dataset.labelFailed + ' (' + data.failed + ')';
+        btn.disabled = false;
+        // Rows that did change are stale now; reloading would hide the errors,
+        // so just stop them being sent again.
+        data.results.forEach(function(r) {
+          if (!r.ok) return;
+          const box = document.querySelector('.bulk-select[value="' + r.id + '"]');
+          if (box) { box.checked = false; box.disabled = true; }
+        });
+      }).catch(function(err) {
+        statusEl.textContent = err.message;
+        btn.disabled = false;
+      });
+    });
+  });
+});
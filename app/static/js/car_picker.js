@@ -0,0 +1,227 @@
+// Booking form car picker. Cars are fetched a page at a time from the JSON
+// API as the filters change, instead of rendering the whole fleet inline.
+document.addEventListener('DOMContentLoaded', function() {
+  const grid = document.getElementById('carSelectorGrid');
+  if (!grid) return;
+  const apiUrl = grid.dataset.apiUrl;
+  const filters = document.getElementById('carPickerFilters');
+  const statusEl = document.getElementById('carPickerStatus');
+  const moreBtn = document.getElementById('carPickerMore');
+  const departure = document.getElementById('planned_departure');
+  const isAr = document.documentElement.lang === 'ar';
+  const na = isAr ? 'غير متاح' : 'N/A';
+
+  const cars = {};
+  let page = 0;
+  let pages = 0;
+  let request = 0;
+  let debounce = null;
+
+  function el(tag, className, text) {
+    const node = document.createElement(tag);
+    if (className) node.className = className;
+    if (text !== undefined) node.textContent = text;
+    return node;
+  }
+
+  function params(nextPage) {
+    const data = new URLSearchParams();
+    data.set('page', nextPage);
+    ['q', 'make', 'seats'].forEach(function(name) {
+      const value = filters.querySelector('[name="' + name + '"]').value.trim();
+      if (value) data.set(name, value);
+    });
+    if (filters.querySelector('[name="available"]').checked) data.set('available', '1');
+    if (filters.querySelector('[name="free_on_day"]').checked && departure && departure.value) {
+      const day = departure.value.slice(0, 10);
+      data.set('from', day + 'T00:00');
+      data.set('to', day + 'T23:59');
+    }
+    return data;
+  }
+
+  function setStatus(label) {
+    statusEl.textContent = label ? statusEl.dataset[label] : '';
+    statusEl.style.display = label ? '' : 'none';
+  }
+
+  function statusBadge(car) {
+    if (car.status === 'borrowed') {
+      const badge = el('div', 'car-status-badge badge-out-pill', isAr ? '🚗 مستعار: ' : '🚗 Borrowed: ');
+      badge.appendChild(el('strong', '', car.borrower));
+      return badge;
+    }
+    if (car.status === 'pending') {
+      const badge = el('div', 'car-status-badge badge-pending-pill', isAr ? '⏳ محجوز: ' : '⏳ Reserved: ');
+      badge.appendChild(el('strong', '', car.borrower));
+      return badge;
+    }
+    let text = isAr ? '✅ متاح' : '✅ Available';
+    if (car.lastBorrower) text += ' · ' + (isAr ? 'آخر مستخدم: ' : 'Last: ') + car.lastBorrower;
+    return el('div', 'car-status-badge badge-free-pill', text);
+  }
+
+  function registrationBadge(car) {
+    if (car.registrationDays === null) return null;
+    if (car.registrationDays < 0) {
+      return el('div', 'car-reg-badge reg-expired',
+        (isAr ? '🚫 انتهى التسجيل: ' : '🚫 Registration EXPIRED: ') + car.registrationExpiry);
+    }
+    if (car.registrationDays <= 30) {
+      return el('div', 'car-reg-badge reg-expiring',
+        (isAr ? '⚠️ ينتهي التسجيل: ' : '⚠️ Registration expires: ') + car.registrationExpiry +
+        ' (' + car.registrationDays + (isAr ? ' يوم)' : ' days)'));
+    }
+    return null;
+  }
+
+  function card(car) {
+    const blocked = car.status === 'borrowed';
+    const label = el('label', 'car-selector-card car-state-' + car.status);
+    label.htmlFor = 'car_' + car.id;
+    if (!blocked) label.addEventListener('click', function() { showCarDetail(car.id); });
+
+    const radio = el('input');
+    radio.type = 'radio';
+    radio.name = 'car_id_radio';
+    radio.id = 'car_' + car.id;
+    radio.value = car.id;
+    radio.disabled = blocked;
+    label.appendChild(radio);
+
+    const inner = el('div', 'car-selector-inner');
+    const imgWrap = el('div', 'car-selector-img');
+    if (car.thumb) {
+      const img = el('img');
+      img.src = car.thumb;
+      img.alt = car.plate;
+      img.loading = 'lazy';
+      imgWrap.appendChild(img);
+    } else {
+      imgWrap.appendChild(el('div', 'car-no-img', '🚗'));
+    }
+    inner.appendChild(imgWrap);
+
+    const info = el('div', 'car-selector-info');
+    info.appendChild(el('div', 'car-selector-plate mono', car.plate));
+    info.appendChild(el('div', 'car-selector-name', car.year + ' ' + car.make + ' ' + car.model));
+    info.appendChild(el('div', 'car-selector-meta',
+      (isAr && car.colorAr ? car.colorAr : car.color) + ' · ' + car.seats + (isAr ? ' مقاعد' : ' seats')));
+    info.appendChild(statusBadge(car));
+    const reg = registrationBadge(car);
+    if (reg) info.appendChild(reg);
+    inner.appendChild(info);
+
+    inner.appendChild(blocked ? el('div', 'car-blocked-icon', '🔒') : el('div', 'car-selector-check', '✓'));
+    label.appendChild(inner);
+    return label;
+  }
+
+  function load(nextPage) {
+    const mine = ++request;
+    if (nextPage === 1) {
+      grid.replaceChildren();
+      moreBtn.style.display = 'none';
+    }
+    setStatus('labelLoading');
+    fetch(apiUrl + '?' + params(nextPage).toString(), { credentials: 'same-origin' })
+      .then(function(resp) {
+        if (!resp.ok) throw new Error('HTTP ' + resp.status);
+        return resp.json();
+      })
+      .then(function(data) {
+        if (mine !== request) return;     // a newer filter change is in flight
+        data.cars.forEach(function(car) {
+          cars[car.id] = car;
+          grid.appendChild(card(car));
+        });
+        page = data.page;
+        pages = data.pages;
+        setStatus(data.total ? '' : 'labelEmpty');
+        moreBtn.style.display = page < pages ? '' : 'none';
+        const chosen = document.getElementById('car_id_input').value;
+        const selected = chosen && grid.querySelector('label[for="car_' + chosen + '"]');
+        if (selected) selected.classList.add('selected');
+      })
+      .catch(function() {
+        if (mine === request) setStatus('labelError');
+      });
+  }
+
+  function reload() {
+    clearTimeout(debounce);
+    debounce = setTimeout(function() { load(1); }, 250);
+  }
+
+  function showCarDetail(id) {
+    const car = cars[id];
+    if (!car || car.status === 'borrowed') return;
+
+    document.getElementById('car_id_input').value = id;
+    grid.querySelectorAll('.car-selector-card').forEach(function(c) { c.classList.remove('selected'); });
+    grid.querySelector('label[for="car_' + id + '"]').classList.add('selected');
+
+    const img = document.getElementById('carDetailImg');
+    const noImg = document.getElementById('carDetailNoImg');
+    if (car.image) { img.src = car.image; img.style.display = 'block'; noImg.style.display = 'none'; }
+    else { img.style.display = 'none'; noImg.style.display = 'flex'; }
+
+    document.getElementById('carDetailPlate').textContent = isAr && car.plateAr ? car.plateAr : car.plate;
+    document.getElementById('carDetailTitle').textContent = car.year + ' ' + car.make + ' ' + car.model;
+    document.getElementById('carDetailMake').textContent = car.make;
+    document.getElementById('carDetailModel').textContent = car.model;
+    document.getElementById('carDetailYear').textContent = car.year;
+    document.getElementById('carDetailColor').textContent = isAr && car.colorAr ? car.colorAr : car.color;
+    document.getElementById('carDetailSeats').textContent = car.seats;
+
+    const km = parseFloat(car.mileage) || 0;
+    document.getElementById('carDetailMileage').textContent = km > 0 ? km.toLocaleString() + ' km' : na;
+    document.getElementById('carDetailMajor').textContent = car.majorService || na;
+    document.getElementById('carDetailMinor').textContent = car.minorService || na;
+
+    const lastUserEl = document.getElementById('carDetailLastUser');
+    if (car.status === 'pending') {
+      lastUserEl.textContent = isAr ? 'محجوز: ' + car.borrower : 'Reserved by: ' + car.borrower;
+    } else {
+      lastUserEl.textContent = car.lastBorrower || na;
+    }
+
+    const noteWrap = document.getElementById('carDetailNote');
+    if (car.lastNote && car.lastNote.trim()) {
+      document.getElementById('carDetailNoteText').textContent = car.lastNote;
+      noteWrap.style.display = 'block';
+    } else {
+      noteWrap.style.display = 'none';
+    }
+
+    const statusNote = document.getElementById('carDetailStatus');
+    if (car.status === 'pending') {
+      statusNote.className = 'car-detail-status-note note-pending';
+      statusNote.textContent = isAr
+        ? '⏳ محجوزة من قِبَل: ' + car.borrower + ' — لكن يمكنك الحجز'
+        : '⏳ Reserved by: ' + car.borrower + ' — you can still book it';
+      statusNote.style.display = 'block';
+    } else {
+      statusNote.style.display = 'none';
+    }
+
+    const panel = document.getElementById('carDetailPanel');
+    panel.style.display = 'block';
+    panel.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
+  }
+
+  filters.addEventListener('input', reload);
+  filters.addEventListener('change', reload);
+  filters.addEventListener('submit', function(e) {
+    e.preventDefault();
+    clearTimeout(debounce);
+    load(1);
+  });
+  if (departure) {
+    departure.addEventListener('change', function() {
+      if (filters.querySelector('[name="free_on_day"]').checked) reload();
+    });
+  }
+  moreBtn.addEventListener('click', function() { load(page + 1); });
+  load(1);
+});
@@ -0,0 +1,114 @@
+// Bulk approve / archive on the leave admin dashboard. A ticked selection is
+// sent in chunks of at most data-max-ids (the server's limit per request);
+// "archive all matching" is queued on the server and its progress is polled
+// until the worker finishes.
+document.addEventListener('DOMContentLoaded', function() {
+  const bar = document.getElementById('leaveBulkBar');
+  if (!bar) return;
+  const apiUrl = bar.dataset.apiUrl;
+  const maxIds = parseInt(bar.dataset.maxIds, 10);
+  const statusEl = document.getElementById('leaveBulkStatus');
+  const selectAll = document.getElementById('bulkSelectAll');
+
+  function send(payload) {
+    return fetch(apiUrl, {
+      method: 'POST',
+      credentials: 'same-origin',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(payload)
+    }).then(function(resp) {
+      return resp.json().then(function(data) {
+        if (!resp.ok || !data.ok) throw new Error(data.error || ('HTTP ' + resp.status));
+        return data;
+      });
+    });
+  }
+
+  // Send the selection one chunk at a time, adding up what each chunk changed.
+  function sendSelection(status, ids) {
+    const total = { updated: 0, skipped: [] };
+    let chain = Promise.resolve();
+    for (let i = 0; i < ids.length; i += maxIds) {
+      const chunk = ids.slice(i, i + maxIds);
+      chain = chain.then(function() {
+        return send({ status: status, ids: chunk }).then(function(data) {
+          total.updated += data.updated;
+          total.skipped = total.skipped.concat(data.skipped);
+        });
+      });
+    }
+    return chain.then(function() { return total; });
+  }
+
+  function showProgress(action) {
+    const label = action.state === 'done' ? bar.dataset.labelDone
+      : action.state === 'failed' ? bar.dataset.labelFailed : bar.dataset.labelProgress;
+    let text = label + ': ' + action.done + ' / ' + action.total + ' (' + action.percent + '%)';
+    if (action.skipped) text += ', ' + bar.dataset.labelSkipped + ' ' + action.skipped;
+    statusEl.textContent = text;
+  }
+
+  function poll(url) {
+    fetch(url, { credentials: 'same-origin' })
+      .then(function(resp) { return resp.json(); })
+      .then(function(data) {
+        showProgress(data.action);
+        if (data.action.state === 'done') {
+          setTimeout(function() { window.location.reload(); }, 1000);
+        } else if (data.action.state !== 'failed') {
+          setTimeout(function() { poll(url); }, 2000);
+        }
+      })
+      .catch(function() { setTimeout(function() { poll(url); }, 5000); });
+  }
+
+  if (selectAll) {
+    selectAll.addEventListener('change', function() {
+      document.querySelectorAll('.bulk-select').forEach(function(box) { box.checked = selectAll.checked; });
+    });
+  }
+
+  bar.querySelectorAll('[data-bulk-selected]').forEach(function(btn) {
+    btn.addEventListener('click', function() {
+      const ids = Array.from(document.querySelectorAll('.bulk-select:checked'))
+        .map(function(box) { return parseInt(box.value, 10); });
+      if (!ids.length) {
+        statusEl.textContent = bar.dataset.labelNone;
+        return;
+      }
+      btn.disabled = true;
+      sendSelection(btn.dataset.bulkSelected, ids).then(function(data) {
+        if (!data.skipped.length) {
+          window.location.reload();
+          return;
+        }
+        statusEl.textContent = bar.dataset.labelUpdated + ' ' + data.updated + ', ' +
+          bar.dataset.labelSkipped + ' ' + data.skipped.length;
+        btn.disabled = false;
+      }).catch(function(err) {
+        statusEl.textContent = err.message;
+        btn.disabled = false;
+      });
+    });
+  });
+
+  const archiveBtn = document.getElementById('bulkFilterArchive');
+  archiveBtn.addEventListener('click', function() {
+    const before = document.getElementById('bulkFilterBefore').value;
+    if (!before) {
+      document.getElementById('bulkFilterBefore').focus();
+      return;
+    }
+    archiveBtn.disabled = true;
+    send({
+      status: 'archived',
+      filter: { status: document.getElementById('bulkFilterStatus').value, before: before }
+    }).then(function(data) {
+      showProgress(data.action);
+      poll(data.progress_url);
+    }).catch(function(err) {
+      statusEl.textContent = err.message;
+      archiveBtn.disabled = false;
+    });
+  });
+});
@@ -0,0 +1,109 @@
+// Mark notifications read through the JSON API without reloading the inbox.
+// Falls back to the plain form POST if the request fails.
+document.addEventListener('DOMContentLoaded', function() {
+  const list = document.getElementById('notif-list');
+  if (!list) return;
+  const apiUrl = list.dataset.apiUrl;
+  const markSelectedBtn = document.getElementById('notif-mark-selected');
+
+  function setUnreadCount(count) {
+    const bell = document.querySelector('.nav-bell');
+    let badge = bell ? bell.querySelector('.nav-bell-badge') : null;
+    if (badge && count <= 0) {
+      badge.remove();
+    } else if (bell && count > 0) {
+      if (!badge) {
+        badge = document.createElement('span');
+        badge.className = 'nav-bell-badge';
+        bell.appendChild(badge);
+      }
+      badge.textContent = count;
+    }
+
+    const subtitle = document.getElementById('notif-subtitle');
+    if (subtitle) {
+      subtitle.textContent = count > 0
+        ? count + ' ' + (count === 1 ? subtitle.dataset.labelOne : subtitle.dataset.labelMany)
+        : subtitle.dataset.labelNone;
+    }
+    const bulk = document.getElementById('notif-bulk-actions');
+    if (bulk && count <= 0) bulk.remove();
+  }
+
+  function markRowRead(id) {
+    const row = list.querySelector('[data-notif-id="' + id + '"]');
+    if (!row) return;
+    row.classList.remove('unread');
+    const dot = row.querySelector('.notification-dot');
+    if (dot) dot.classList.add('read');
+    row.querySelectorAll('.notif-select, form[data-notif-read]').forEach(function(el) {
+      el.remove();
+    });
+  }
+
+  function refreshSelection() {
+    if (markSelectedBtn) {
+      markSelectedBtn.disabled = !list.querySelector('.notif-select:checked');
+    }
+  }
+
+  function send(payload) {
+    return fetch(apiUrl, {
+      method: 'POST',
+      credentials: 'same-origin',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(payload)
+    }).then(function(resp) {
+      if (!resp.ok) throw new Error('HTTP ' + resp.status);
+      return resp.json();
+    }).then(function(data) {
+      if (!data.ok) throw new Error(data.error || 'failed');
+      return data;
+    });
+  }
+
+  list.querySelectorAll('form[data-notif-read]').forEach(function(form) {
+    form.addEventListener('submit', function(e) {
+      e.preventDefault();
+      const id = parseInt(form.dataset.notifRead, 10);
+      send({ ids: [id] }).then(function(data) {
+        markRowRead(id);
+        setUnreadCount(data.unread);
+        refreshSelection();
+      }).catch(function() { form.submit(); });
+    });
+  });
+
+  list.addEventListener('change', function(e) {
+    if (e.target.classList.contains('notif-select')) refreshSelection();
+  });
+
+  if (markSelectedBtn) {
+    markSelectedBtn.addEventListener('click', function() {
+      const ids = Array.prototype.map.call(
+        list.querySelectorAll('.notif-select:checked'),
+        function(el) { return parseInt(el.value, 10); }
+      );
+      if (!ids.length) return;
+      markSelectedBtn.disabled = true;
+      send({ ids: ids }).then(function(data) {
+        ids.forEach(markRowRead);
+        setUnreadCount(data.unread);
+        refreshSelection();
+      }).catch(function() { refreshSelection(); });
+    });
+  }
+
+  const allForm = document.querySelector('form[data-notif-all]');
+  if (allForm) {
+    allForm.addEventListener('submit', function(e) {
+      e.preventDefault();
+      send({ all: true }).then(function(data) {
+        list.querySelectorAll('[data-notif-id]').forEach(function(row) {
+          markRowRead(row.dataset.notifId);
+        });
+        setUnreadCount(data.unread);
+      }).catch(function() { allForm.submit(); });
+    });
+  }
+});
@@ -0,0 +1,44 @@
+from flask import Response, stream_template
+
+# Printable reports can run to tens of thousands of rows. They are streamed:
+# the view passes stream_rows(query) (a yield_per server-side cursor on
+# Postgres) and the template is rendered chunk by chunk as rows arrive,
+# so the browser starts drawing the table at once and the worker never
+# holds the whole page or result set in memory. Totals shown above the table
+# have to come from a separate aggregate query, not from the row iterator.
+
+STREAM_ROWS = 500
+# Jinja yields very small pieces; coalesce them before each socket write.
+CHUNK_SIZE = 16 * 1024
+
+
+def _coalesce(chunks, size):
+    buf, length = [], 0
+    for chunk in chunks:
+        buf.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield "".join(buf)
+            buf, length = [], 0
+    if buf:
+        yield "".join(buf)
+
+
+def stream_rows(query):
+    """Execute `query` now and return an iterator that fetches its rows in
+    batches of STREAM_ROWS. Executing here, inside the view, keeps the
+    statement on whichever bind the view selected (see use_replica) even
+    though the rows are only consumed while the response streams."""
+    from app import db
+    result = db.session.execute(query.statement,
+                                execution_options={"yield_per": STREAM_ROWS})
+    return iter(result.scalars() if query.is_single_entity else result)
+
+
+def stream_page(template_name, **context):
+    """Like render_template, but returns a streamed response."""
+    response = Response(_coalesce(stream_template(template_name, **context), CHUNK_SIZE),
+                        mimetype="text/html")
+    # Tell nginx to pass chunks through instead of buffering the whole body.
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,67 @@
+from flask import current_app
+from app import db
+from app.jobs import task
+
+# Job functions run by `flask worker`. Arguments are the JSON payload given
+# to enqueue(); each function runs inside an app context and its session is
+# committed by the worker when it returns.
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+@task("helpdesk.notify_department")
+def notify_department(department, title, title_ar, body, body_ar, link):
+    """Fan a notification out to every active staff member of a department."""
+    from app.helpdesk.models import HelpDeskStaff, Notification
+    staff = HelpDeskStaff.query.filter_by(department=department, is_active=True).all()
+    db.session.add_all([
+        Notification(recipient_username=s.username, title=title, title_ar=title_ar,
+                     body=body, body_ar=body_ar, link=link)
+        for s in staff
+    ])
+
+
+@task("maintenance.compact_notifications", every=DAY)
+def compact_notifications_job():
+    from app.helpdesk.maintenance import purge_read_notifications, compact_notifications
+    cfg = current_app.config
+    batch = cfg.get("NOTIFICATION_BATCH_SIZE", 1000)
+    purge_read_notifications(cfg.get("NOTIFICATION_RETENTION_DAYS", 90), batch=batch)
+    compact_notifications(cfg.get("NOTIFICATION_COMPACT_AFTER_DAYS", 7), batch=batch)
+
+
+@task("cars.refresh_alerts", every=DAY)
+def refresh_car_alerts_job():
+    from app.cars.compliance import refresh_alerts
+    refresh_alerts()
+
+
+@task("leave.bulk_status", max_attempts=3)
+def leave_bulk_status_job(action_id):
+    from app.leave_bulk import run_filter_action
+    run_filter_action(action_id)
+
+
+@task("cars.make_thumbnail")
+def make_thumbnail_job(name):
+    from app.cars.images import make_thumbnail
+    make_thumbnail(name)
+
+
+@task("cars.sweep_images", every=DAY)
+def sweep_images_job():
+    from app.cars.images import sweep_orphans
+    sweep_orphans(current_app.config.get("CAR_IMAGE_GRACE_SECONDS", 3600), echo=lambda _: None)
+
+
+@task("maintenance.sweep_sessions", every=HOUR)
+def sweep_sessions_job():
+    from app.sessions import sweep_expired
+    sweep_expired()
+
+
+@task("maintenance.purge_jobs", every=DAY)
+def purge_jobs_job():
+    from app.jobs import purge_finished
+    purge_finished(current_app.config.get("JOB_RETENTION_DAYS", 14))
@@ -5,6 +5,70 @@ AUTH_MODE = "mock"
 SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-key-change-in-prod")
 SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "postgresql://leaveuser:leavepass@db:5432/leaveapp")
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+# Optional read-only replica for reports (see app/replica.py)
+REPLICA_DATABASE_URL = os.environ.get("REPLICA_DATABASE_URL")
+SQLALCHEMY_BINDS = {
+    "replica": {
+        "url": REPLICA_DATABASE_URL,
+        "pool_pre_ping": True,
+        "connect_args": {"connect_timeout": 2},
+    },
+} if REPLICA_DATABASE_URL else {}
+REPLICA_CHECK_SECONDS = 10
+REPLICA_MAX_LAG_SECONDS = 5
 MOCK_USERS_FILE = "mock_data/users.json"
-SESSION_TYPE = "filesystem"
+# {% cache %} template fragments (off in dev so template edits show up)
+TEMPLATE_FRAGMENT_CACHE = False
+TEMPLATE_FRAGMENT_CACHE_SIZE = 512
+# Jinja bytecode cache directory (None: compile in memory only)
+JINJA_BYTECODE_CACHE_DIR = None
+# Resolve static URLs through manifest.json (off in dev so edits show up)
+ASSET_MANIFEST = False
+SESSION_TYPE = "sqlalchemy"
+SESSION_SQLALCHEMY_TABLE = "sessions"
+SESSION_PERMANENT = True
+SESSION_USE_SIGNER = True
+SESSION_REFRESH_EACH_REQUEST = False
+# Seconds last_activity may lag before the session is rewritten
+SESSION_ACTIVITY_GRANULARITY = 60
 PERMANENT_SESSION_LIFETIME = timedelta(minutes=10)
+# Seconds between reference-data version checks per worker
+REFDATA_CHECK_SECONDS = 5
+# Per-worker query result cache, invalidated via LISTEN/NOTIFY on writes
+QUERY_CACHE_ENABLED = True
+QUERY_CACHE_SIZE = 1024
+# Notification inbox and retention (flask compact-notifications)
+NOTIFICATIONS_PER_PAGE = 30
+NOTIFICATION_RETENTION_DAYS = 90
+NOTIFICATION_COMPACT_AFTER_DAYS = 7  # recent repeats stay separate until they settle
+NOTIFICATION_BATCH_SIZE = 1000
+# Cars per page in the booking form's car picker (/cars/api/cars)
+CAR_PICKER_PAGE_SIZE = 24
+# Car photo thumbnails (needs Pillow) and how long an unused photo is kept
+CAR_THUMB_SIZE = (320, 200)
+CAR_IMAGE_GRACE_SECONDS = 3600
+# Fleet compliance alerts (cars.refresh_alerts job, flask refresh-car-alerts).
+# A service is due after *_SERVICE_DAYS or *_SERVICE_KM, whichever comes first.
+REGISTRATION_WARNING_DAYS = 30
+MAJOR_SERVICE_DAYS = 365
+MAJOR_SERVICE_KM = 20000
+MINOR_SERVICE_DAYS = 180
+MINOR_SERVICE_KM = 5000
+# Background jobs (flask worker)
+JOB_WORKER_THREADS = 4
+JOB_POLL_SECONDS = 2.0
+JOB_BACKOFF_SECONDS = 30
+JOB_BACKOFF_MAX_SECONDS = 3600
+JOB_TIMEOUT_SECONDS = 1800
+JOB_RETENTION_DAYS = 14
+# Prometheus metrics on /metrics (admins, or scrapers connecting directly,
+# not through nginx, from these addresses)
+METRICS_ENABLED = True
+METRICS_ALLOWED_IPS = ("127.0.0.1", "::1")
+# N+1 / slow query detector (QUERYWATCH=1 flask run). QUERYWATCH_RAISE turns
+# findings into QueryBudgetExceeded errors, which fails tests and CI runs.
+QUERYWATCH_ENABLED = os.environ.get("QUERYWATCH", "0") == "1"
+QUERYWATCH_RAISE = os.environ.get("QUERYWATCH_RAISE", "0") == "1"
+QUERYWATCH_REPEAT_THRESHOLD = 5
+QUERYWATCH_SLOW_MS = 200
+QUERYWATCH_MAX_STATEMENTS = None
@@ -6,6 +6,69 @@ AUTH_MODE = os.environ.get("AUTH_MODE", "ldap")
 SECRET_KEY = os.environ.get("SECRET_KEY")
 SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL")
 SQLALCHEMY_TRACK_MODIFICATIONS = False
-SESSION_TYPE = "filesystem"
+# Optional read-only replica for reports (see app/replica.py)
+REPLICA_DATABASE_URL = os.environ.get("REPLICA_DATABASE_URL")
+SQLALCHEMY_BINDS = {
+    "replica": {
+        "url": REPLICA_DATABASE_URL,
+        "pool_pre_ping": True,
+        "connect_args": {"connect_timeout": 2},
+    },
+} if REPLICA_DATABASE_URL else {}
+REPLICA_CHECK_SECONDS = 10
+REPLICA_MAX_LAG_SECONDS = 5
+# {% cache %} template fragments, LRU-bounded per worker
+TEMPLATE_FRAGMENT_CACHE = True
+TEMPLATE_FRAGMENT_CACHE_SIZE = 512
+# Jinja bytecode cache directory, filled by `flask compile-templates`
+JINJA_BYTECODE_CACHE_DIR = os.environ.get("JINJA_BYTECODE_CACHE_DIR", "/tmp/leavepass-jinja")
+# Resolve static URLs to fingerprinted names from `flask build-assets`
+ASSET_MANIFEST = True
+SESSION_TYPE = "sqlalchemy"
+SESSION_SQLALCHEMY_TABLE = "sessions"
+SESSION_PERMANENT = True
+SESSION_USE_SIGNER = True
+SESSION_REFRESH_EACH_REQUEST = False
+# Seconds last_activity may lag before the session is rewritten
+SESSION_ACTIVITY_GRANULARITY = 60
 MOCK_USERS_FILE = "mock_data/users.json"
 PERMANENT_SESSION_LIFETIME = timedelta(minutes=10)
+# Seconds between reference-data version checks per worker
+REFDATA_CHECK_SECONDS = 5
+# Per-worker query result cache, invalidated via LISTEN/NOTIFY on writes
+QUERY_CACHE_ENABLED = True
+QUERY_CACHE_SIZE = 1024
+# Notification inbox and retention (flask compact-notifications)
+NOTIFICATIONS_PER_PAGE = 30
+NOTIFICATION_RETENTION_DAYS = 90
+NOTIFICATION_COMPACT_AFTER_DAYS = 7  # recent repeats stay separate until they settle
+NOTIFICATION_BATCH_SIZE = 1000
+# Cars per page in the booking form's car picker (/cars/api/cars)
+CAR_PICKER_PAGE_SIZE = 24
+# Car photo thumbnails (needs Pillow) and how long an unused photo is kept
+CAR_THUMB_SIZE = (320, 200)
+CAR_IMAGE_GRACE_SECONDS = 3600
+# Fleet compliance alerts (cars.refresh_alerts job, flask refresh-car-alerts).
+# A service is due after *_SERVICE_DAYS or *_SERVICE_KM, whichever comes first.
+REGISTRATION_WARNING_DAYS = 30
+MAJOR_SERVICE_DAYS = 365
+MAJOR_SERVICE_KM = 20000
+MINOR_SERVICE_DAYS = 180
+MINOR_SERVICE_KM = 5000
+# Background jobs (flask worker)
+JOB_WORKER_THREADS = 4
+JOB_POLL_SECONDS = 2.0
+JOB_BACKOFF_SECONDS = 30
+JOB_BACKOFF_MAX_SECONDS = 3600
+JOB_TIMEOUT_SECONDS = 1800
+JOB_RETENTION_DAYS = 14
+# Prometheus metrics on /metrics (admins, or scrapers connecting directly,
+# not through nginx, from these addresses)
+METRICS_ENABLED = True
+METRICS_ALLOWED_IPS = ("127.0.0.1", "::1")
+# N+1 / slow query detector; enable on staging only (QUERYWATCH=1)
+QUERYWATCH_ENABLED = os.environ.get("QUERYWATCH", "0") == "1"
+QUERYWATCH_RAISE = False
+QUERYWATCH_REPEAT_THRESHOLD = 5
+QUERYWATCH_SLOW_MS = 500
+QUERYWATCH_MAX_STATEMENTS = None
@@ -0,0 +1,32 @@
+import os
+import shutil
+
+bind = "0.0.0.0:5000"
+workers = int(os.environ.get("GUNICORN_WORKERS", 4))
+
+# Import the app once in the master and fork workers from it: code, templates
+# loader and config are shared copy-on-write and workers start instantly.
+# create_app() opens no database connections, so nothing leaks across fork.
+preload_app = True
+
+
+def on_starting(server):
+    # Samples from a previous run would otherwise be merged into /metrics.
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def post_fork(server, worker):
+    # Belt and braces: drop any pooled connection inherited from the master.
+    from app import db
+    app = server.app.wsgi()
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)